@@ -46,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tracker.middleware.LecturerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -100,6 +101,23 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Hashers passwords may be stored with; the first is used for Django's own users.
+# Argon2 needs argon2-cffi and bcrypt needs bcrypt installed.
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# System_User (lecturer login) passwords: the algorithm of one of PASSWORD_HASHERS and the work
+# factor it runs with, e.g. {'iterations': 300000} for PBKDF2 or {'time_cost': 2} for Argon2.
+# Passwords hashed otherwise are rehashed on their user's next login. `manage.py benchmark_login`
+# measures what a login costs under each choice.
+SYSTEM_USER_PASSWORD_HASHER = 'pbkdf2_sha256'
+SYSTEM_USER_HASHER_PARAMS = {}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -123,6 +141,62 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'  # Required for collectstatic
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Seconds a lecturer looked up by tracker.middleware.LecturerMiddleware is cached (0 disables).
+# The cached role decides what a lecturer may open and saving a lecturer only clears the cache
+# of the process that saved it, so this needs a CACHES backend every worker shares (Memcached,
+# Redis); the system checks reject it with the default per-process LocMemCache.
+LECTURER_CACHE_TTL = 0
+
+# Result and nominal roll lists
+# 'exact' counts every matching row; 'estimate' stops counting at LIST_COUNT_LIMIT rows.
+LIST_COUNT_MODE = 'estimate'
+LIST_COUNT_LIMIT = 1000
+# Rows fetched per database round trip when a list is exported as CSV or XLSX.
+EXPORT_CHUNK_SIZE = 2000
+
+# Uploads
+# Number of rows read from an uploaded file per batch.
+UPLOAD_CHUNK_SIZE = 5000
+# Number of rows written per bulk INSERT when a previewed upload is submitted.
+UPLOAD_BATCH_SIZE = 1000
+
+# Background upload jobs: 'thread' runs them on JOB_WORKERS threads in the web process,
+# 'process' leaves them for `manage.py run_jobs`, 'sync' runs them inside the request.
+JOB_RUNNER = 'thread'
+JOB_WORKERS = 2
+# Seconds a running job may go without a heartbeat from its worker (one per batch of rows
+# validated) before it is taken to have died with its process and is marked failed.
+JOB_LEASE_TIMEOUT = 600
+
+# Seconds the courses, years of study, academic years and semesters offered as form choices
+# are cached (0 disables). Saving or deleting one of them clears the cache.
+REFERENCE_CACHE_TTL = 3600
+# Seconds the unit offerings a student can complain about are cached (0 disables).
+OFFERING_CACHE_TTL = 300
+# Both caches are cleared through version stamps kept in the database; each worker re-reads
+# them at most every CACHE_VERSION_CHECK seconds, so others see a change within that time.
+CACHE_VERSION_CHECK = 5
+
+# Outgoing email: 'thread' sends queued messages from a background thread in the web process,
+# which also wakes itself for retries, 'process' leaves them for `manage.py send_queued_mail`
+# (run it every minute or so), 'sync' sends them inside the request.
+MAIL_RUNNER = 'thread'
+# Messages sent over one mail connection per claim.
+OUTBOX_BATCH_SIZE = 50
+# A failed message is retried after OUTBOX_RETRY_DELAY seconds, doubling each time, and
+# marked failed after OUTBOX_MAX_ATTEMPTS attempts.
+OUTBOX_RETRY_DELAY = 60
+OUTBOX_MAX_ATTEMPTS = 5
+# Seconds a claimed message is held by its sender before another may pick it up.
+OUTBOX_CLAIM_TIMEOUT = 600
+
+# Complaint codes
+# Counter values reserved from the database at a time per process.
+COMPLAINT_CODE_BLOCK_SIZE = 20
+# Key of the permutation that turns the counter into complaint codes. Never change it once
+# codes have been issued, or new codes may repeat old ones.
+COMPLAINT_CODE_KEY = 'tracker-complaint-codes'
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
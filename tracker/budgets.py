@@ -0,0 +1,166 @@
+"""
+Performance budgets for every tracker URL: the most queries a request may run and the p95
+latency it has to stay under on the benchmark_urls data set. tracker.tests checks the query
+budgets on every test run; the benchmark_urls command checks both against thousands of seeded
+rows and writes a report that can be diffed between releases.
+"""
+import math
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from .models import Complaint, Response, System_User, PasswordResetToken, UploadJob
+
+# role is a Lecturer role, 'Student' for a student who has picked their course, or None for
+# an anonymous visitor. kwargs name the URL arguments, looked up in the fixtures of make_fixtures().
+URLBudget = namedtuple(
+    'URLBudget', ['name', 'role', 'queries', 'p95_ms', 'kwargs', 'method', 'status'],
+    defaults=((), 'GET', 200)
+)
+
+URL_BUDGETS = [
+    URLBudget('student', None, 5, 30),
+    URLBudget('post-complaint', 'Student', 3, 25),
+    URLBudget('signup', None, 0, 25),
+    URLBudget('login', None, 0, 25),
+    URLBudget('logout', 'Member', 4, 25, status=302),
+    URLBudget('reset-password', None, 0, 25),
+    URLBudget('reset-password', None, 1, 25, kwargs=('token',)),
+
+    URLBudget('lecturer-dashboard', 'Member', 9, 30),
+    URLBudget('exam-dashboard', 'Exam Officer', 9, 30),
+    URLBudget('cod-dashboard', 'COD', 9, 30),
+
+    URLBudget('load-nominal-roll', 'Member', 4, 30),
+    URLBudget('submit-nominal-roll', 'Member', 3, 25, method='POST', status=302),
+    URLBudget('load-result', 'Member', 4, 30),
+    URLBudget('submit-result', 'Member', 3, 25, method='POST', status=302),
+    URLBudget('upload-job-status', 'Member', 3, 25, kwargs=('job_id',)),
+
+    URLBudget('result', 'Member', 6, 40),
+    URLBudget('nominal-roll', 'Member', 6, 40),
+    URLBudget('exam-result', 'Exam Officer', 6, 40),
+    URLBudget('exam-nominal-roll', 'Exam Officer', 6, 40),
+    URLBudget('cod-result', 'COD', 6, 40),
+    URLBudget('cod-nominal-roll', 'COD', 6, 40),
+
+    URLBudget('cod-complaints', 'COD', 3, 150),
+    URLBudget('assign-lecturer', 'COD', 8, 30, kwargs=('complaint_code',)),
+    URLBudget('cod-respond', 'COD', 7, 30, kwargs=('complaint_code',)),
+    URLBudget('lecturer-complaints', 'Member', 4, 40),
+    URLBudget('lecturer-respond-to-complaint', 'Member', 7, 30, kwargs=('complaint_code',)),
+    URLBudget('exam-complaints', 'Exam Officer', 4, 40),
+    URLBudget('exam-respond-to-complaint', 'Exam Officer', 7, 30, kwargs=('complaint_code',)),
+
+    URLBudget('cod-responses-list', 'COD', 4, 40),
+    URLBudget('cod-approve-response', 'COD', 6, 30, kwargs=('response_id',)),
+    URLBudget('approved-responses', 'Exam Officer', 4, 400),
+    URLBudget('delete-response', 'Exam Officer', 4, 25, kwargs=('pk',)),
+]
+
+
+def budget_label(budget):
+    return ' '.join([budget.name, *(f'<{kwarg}>' for kwarg in budget.kwargs)])
+
+
+def unbudgeted_urls(urlconf='tracker.urls'):
+    """Labels of the named URLs in urlconf that have no entry in URL_BUDGETS."""
+    budgeted = {(budget.name, tuple(sorted(budget.kwargs))) for budget in URL_BUDGETS}
+    missing = []
+    for pattern in get_resolver(urlconf).url_patterns:
+        key = (pattern.name, tuple(sorted(pattern.pattern.converters)))
+        if pattern.name and key not in budgeted:
+            missing.append(' '.join([pattern.name, *(f'<{kwarg}>' for kwarg in key[1])]))
+    return missing
+
+
+def make_fixtures(member, exam_officer, cod, complaint_offering, student):
+    """
+    Create the rows the URLs with arguments point at and return them, with the lecturer
+    of each role, as the fixtures budget_url() and log_in() read. Their keys are fixed so the
+    URLs in two reports match.
+    """
+    complaint = Complaint.objects.create(
+        complaint_code='BUDGET', student=student, unit_offering=complaint_offering,
+        missing_type='CAT', assigned_lecturer=member
+    )
+    pending = Response.objects.create(
+        student=student, unit_offering=complaint_offering, academic_year=complaint_offering.academic_year, cat_mark=20
+    )
+    approved = Response.objects.create(
+        student=student, unit_offering=complaint_offering, academic_year=complaint_offering.academic_year, cat_mark=20,
+        approved_by_cod=True
+    )
+    user, created = System_User.objects.get_or_create(username=member.username)
+    token = PasswordResetToken.objects.create(username=user, token='budget')
+    job = UploadJob.objects.create(action='validate', lecturer=member)
+    return {
+        'lecturers': {'Member': member, 'Exam Officer': exam_officer, 'COD': cod},
+        'student_data': {
+            'reg_no': student.reg_no,
+            'course': complaint_offering.course_id,
+            'year_of_study': complaint_offering.year_of_study.study_year,
+            'academic_year': complaint_offering.academic_year.academic_year,
+            'semester_id': complaint_offering.semester_id,
+        },
+        'complaint_code': complaint.complaint_code,
+        'response_id': pending.response_id,
+        'pk': approved.pk,
+        'token': token.token,
+        'job_id': job.job_id,
+    }
+
+
+def budget_url(budget, fixtures):
+    return reverse(budget.name, kwargs={kwarg: fixtures[kwarg] for kwarg in budget.kwargs})
+
+
+def log_in(client, role, fixtures):
+    """Give client the session of a user with role, or an empty one for None."""
+    client.logout()
+    if role is None:
+        return
+    session = client.session
+    if role == 'Student':
+        session['student_data'] = fixtures['student_data']
+    else:
+        lecturer = fixtures['lecturers'][role]
+        session['username'] = lecturer.username
+        session['role'] = lecturer.role
+    session.save()
+
+
+def measure(client, budget, fixtures, repeat=1):
+    """
+    Request budget's URL repeat times and return its status, the queries of the first request
+    (run with an empty cache, so cached lookups are counted) and the median and p95 latency.
+    """
+    url = budget_url(budget, fixtures)
+    request = client.post if budget.method == 'POST' else client.get
+    timings = []
+    for run in range(repeat):
+        # Every request gets a fresh session, since some (logout, submit) consume it
+        log_in(client, budget.role, fixtures)
+        if run == 0:
+            cache.clear()
+            # CaptureQueriesContext counts nothing once the connection's query log is full
+            connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request(url)
+            timings.append((time.perf_counter() - start) * 1000)
+        if run == 0:
+            status, query_count = response.status_code, len(queries.captured_queries)
+
+    timings.sort()
+    return {
+        'url': url,
+        'status': status,
+        'queries': query_count,
+        'median_ms': round(timings[len(timings) // 2], 2),
+        'p95_ms': round(timings[min(len(timings) - 1, math.ceil(len(timings) * 0.95) - 1)], 2),
+    }
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, register
+
+
+@register()
+def check_lecturer_cache(app_configs, **kwargs):
+    """A cached lecturer's role grants access, so it may only be cached where every worker sees the same entry."""
+    if getattr(settings, 'LECTURER_CACHE_TTL', 0) and isinstance(caches['default'], LocMemCache):
+        return [Error(
+            "LECTURER_CACHE_TTL is set but the default cache is a per-process LocMemCache.",
+            hint=(
+                "Saving a lecturer only clears the cache of the process that saved it, so other workers "
+                "would keep granting a changed role. Configure a shared CACHES backend or set LECTURER_CACHE_TTL = 0."
+            ),
+            id='tracker.E001',
+        )]
+    return []
@@ -0,0 +1,63 @@
+import csv
+import io
+import tempfile
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from openpyxl import Workbook
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_response(queryset, columns, filename, file_format):
+    """
+    Stream queryset as a CSV or XLSX attachment. columns is a list of (key, heading) where key
+    names a value of the queryset's values() rows. Rows are read with iterator() in chunks of
+    EXPORT_CHUNK_SIZE, so the queryset is never loaded into memory as a whole.
+    """
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    header = [heading for key, heading in columns]
+    rows = ([row[key] for key, heading in columns] for row in queryset.iterator(chunk_size=chunk_size))
+
+    if file_format == 'xlsx':
+        content = stream_xlsx(header, rows)
+    else:
+        content = stream_csv(header, rows, chunk_size)
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
+def stream_csv(header, rows, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_xlsx(header, rows, block_size=64 * 1024):
+    # A write-only workbook writes each row to disk as it is appended; the finished file is
+    # then sent from a temporary file rather than built in memory.
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            block = output.read(block_size)
+            if not block:
+                break
+            yield block
@@ -1,5 +1,8 @@
+from functools import partial
+
 from django import forms
-from .views import (
+from .reference import reference_choices, reference_rows
+from .models import (
                     Course, AcademicYear, Semester, YearOfStudy, System_User, Student, UnitOffering, Lecturer, 
                     Response
     
@@ -96,21 +99,40 @@ class UploadFileForm(forms.Form):
     file = forms.FileField(label='Select a CSV or Excel file')
 
 
+class ReferenceChoiceField(forms.ChoiceField):
+    """
+    A choice of one of the reference.REFERENCE_MODELS rows, served from the reference cache so
+    rendering and validating the field runs no query. Cleans to the model instance.
+    """
+    def __init__(self, model, **kwargs):
+        self.model = model
+        super().__init__(choices=partial(reference_choices, model), **kwargs)
+
+    def clean(self, value):
+        value = super().clean(value)
+        return reference_rows(self.model).get(value) if value else None
+
+
 class StudentForm(forms.Form):
     reg_no = forms.CharField(max_length=50, label='Registration Number')
-    course = forms.ModelChoiceField(queryset=Course.objects.all(), label='Course')
-    year_of_study = forms.ModelChoiceField(queryset=YearOfStudy.objects.all(), label='Year of Study')
-    academic_year = forms.ModelChoiceField(queryset=AcademicYear.objects.all(), label='Academic Year')
-    semester = forms.ModelChoiceField(queryset=Semester.objects.all(), label='Semester')
+    course = ReferenceChoiceField(Course, label='Course')
+    year_of_study = ReferenceChoiceField(YearOfStudy, label='Year of Study')
+    academic_year = ReferenceChoiceField(AcademicYear, label='Academic Year')
+    semester = ReferenceChoiceField(Semester, label='Semester')
 
 class MissingMarkForm(forms.Form):
-    unit = forms.ModelChoiceField(queryset=UnitOffering.objects.none(), label='Missing Unit')
+    # The offering id; choices are the (offering_id, label) pairs of intake.student_offerings
+    unit = forms.TypedChoiceField(coerce=int, label='Missing Unit')
     missing_mark_type = forms.MultipleChoiceField(
         choices=[('CAT', 'CAT'), ('EXAM', 'EXAM')],
         widget=forms.CheckboxSelectMultiple,
         label='Select Missing Marks'
     )
 
+    def __init__(self, *args, offerings=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['unit'].choices = [('', '---------'), *offerings]
+
 class AssignLecturerForm(forms.Form):
     lecturer = forms.ModelChoiceField(queryset=Lecturer.objects.none())
 
@@ -0,0 +1,58 @@
+"""
+Student complaint intake: the unit offerings a student can report a missing mark for, and
+the insert of the complaint itself.
+
+Offering lists are cached for settings.OFFERING_CACHE_TTL seconds per (course, year of study,
+academic year, semester), under the 'offerings' version of tracker.versions that
+tracker.signals bumps whenever an offering is saved or deleted.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError
+
+from .models import Complaint, UnitOffering
+from .utils import create_complaint
+from .versions import versioned_key
+
+
+def student_offerings(student_data):
+    """
+    Return (offering_id, label) for each offering matching the course, year of study, academic
+    year and semester a student picked in StudentSelectView, read with a single query on a miss.
+    """
+    ttl = getattr(settings, 'OFFERING_CACHE_TTL', 0)
+    if ttl:
+        key = versioned_key(
+            'offerings', student_data['course'], student_data['year_of_study'], student_data['academic_year'],
+            student_data['semester_id'],
+        )
+        offerings = cache.get(key)
+        if offerings is not None:
+            return offerings
+
+    offerings = [
+        (offering.pk, str(offering))
+        for offering in UnitOffering.objects.filter(
+            course_id=student_data['course'],
+            year_of_study__study_year=student_data['year_of_study'],
+            academic_year__academic_year=student_data['academic_year'],
+            semester_id=student_data['semester_id'],
+        ).select_related('unit', 'course', 'academic_year').order_by('pk')
+    ]
+    if ttl:
+        cache.set(key, offerings, ttl)
+    return offerings
+
+
+def submit_complaint(student_id, offering_id, missing_type):
+    """
+    Insert a complaint in one short transaction, or return None when the student has already
+    complained about the offering. The unique constraint on (student, unit_offering) decides,
+    so concurrent submissions cannot both get in and no check runs before the insert.
+    """
+    try:
+        return create_complaint(student_id=student_id, unit_offering_id=offering_id, missing_type=missing_type)
+    except IntegrityError:
+        if Complaint.objects.filter(student_id=student_id, unit_offering_id=offering_id).exists():
+            return None
+        raise
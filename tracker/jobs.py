@@ -0,0 +1,138 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Upload, UploadJob
+from .uploads import UPLOAD_FORMATS, process_upload, promote_upload, rejection_report
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+ABANDONED_ERROR = 'The upload stopped being processed before it finished. Please upload the file again.'
+
+
+def enqueue(job):
+    """
+    Hand a queued UploadJob to the runner configured by settings.JOB_RUNNER:
+
+    - 'thread' (default): run it on a pool of JOB_WORKERS threads in this process.
+    - 'process': leave it in the table for the run_jobs management command.
+    - 'sync': run it before returning, e.g. in tests.
+    """
+    runner = getattr(settings, 'JOB_RUNNER', 'thread')
+    if runner == 'sync':
+        run_job(job.job_id)
+    elif runner == 'thread':
+        transaction.on_commit(lambda: _get_executor().submit(_run_in_thread, job.job_id))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'JOB_WORKERS', 2), thread_name_prefix='upload-job'
+        )
+    return _executor
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Each worker thread has its own connection
+        connection.close()
+
+
+def run_job(job_id):
+    """Claim a queued job and run it. Does nothing if another worker claimed it first."""
+    if not UploadJob.objects.filter(job_id=job_id, status='queued').update(status='running', heartbeat_at=timezone.now()):
+        return
+
+    job = UploadJob.objects.select_related('upload', 'lecturer__department').get(job_id=job_id)
+    try:
+        if job.upload is None:
+            raise ValueError('The upload was discarded before it could be processed.')
+        JOB_HANDLERS[job.action](job)
+    except ValueError as e:
+        _fail(job, str(e))
+    except Exception:
+        logger.exception('Upload job %s failed', job_id)
+        _fail(job, 'An unexpected error occurred while processing the upload.')
+    else:
+        _update(job, status='done', finished_at=timezone.now())
+    finally:
+        if job.file:
+            job.file.delete(save=False)
+            _update(job, file='')
+
+
+def _fail(job, error):
+    _update(job, status='failed', error=error, finished_at=timezone.now())
+    # A file that failed validation partway has only some of its rows staged; none may be submitted
+    if job.action == 'validate' and job.upload is not None:
+        job.upload.delete()
+
+
+def _lease_cutoff():
+    return timezone.now() - timedelta(seconds=getattr(settings, 'JOB_LEASE_TIMEOUT', 600))
+
+
+def is_abandoned(job):
+    """Whether job is running but its worker has sent no heartbeat for JOB_LEASE_TIMEOUT seconds."""
+    return job.status == 'running' and (job.heartbeat_at is None or job.heartbeat_at < _lease_cutoff())
+
+
+def fail_abandoned_jobs(**filters):
+    """
+    Mark failed the running jobs (matching filters) whose worker died with its process, so the
+    upload page stops waiting for them. They are not rerun: a half-validated upload already has
+    some of its rows staged, so it is discarded instead. Returns the number of jobs failed.
+    """
+    abandoned = UploadJob.objects.filter(
+        Q(heartbeat_at__lt=_lease_cutoff()) | Q(heartbeat_at__isnull=True), status='running', **filters
+    )
+    with transaction.atomic():
+        job_ids = list(abandoned.values_list('job_id', flat=True))
+        failed = UploadJob.objects.filter(job_id__in=job_ids, status='running').update(
+            status='failed', error=ABANDONED_ERROR, finished_at=timezone.now()
+        )
+        Upload.objects.filter(jobs__job_id__in=job_ids, jobs__action='validate').delete()
+    return failed
+
+
+def _update(job, **fields):
+    # update() rather than save() so a stale in-memory upload is never written back
+    UploadJob.objects.filter(job_id=job.job_id).update(**fields)
+
+
+def _validate(job):
+    upload = job.upload
+    columns, dtypes, validate = UPLOAD_FORMATS[upload.kind]
+    validate = partial(validate, school=job.lecturer.department.school_id)
+    on_batch = lambda processed, rejected: _update(
+        job, processed=processed, rejected=rejected, heartbeat_at=timezone.now()
+    )
+
+    with job.file.open('rb'):
+        rejected = process_upload(job.file, columns, dtypes, validate, upload, on_batch=on_batch)
+
+    upload.rejection_report = rejection_report(rejected)
+    upload.save(update_fields=['rejection_report'])
+
+
+def _commit(job):
+    inserted, skipped = promote_upload(job.upload)
+    _update(job, processed=inserted + skipped, rejected=skipped, committed=inserted)
+
+
+JOB_HANDLERS = {
+    'validate': _validate,
+    'commit': _commit,
+}
@@ -0,0 +1,167 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from tracker.models import (
+    School, Department, Program, Course, AcademicYear, Semester, YearOfStudy, Unit, Lecturer, Student,
+    UnitOffering, Complaint, Response, Result, NominalRoll
+)
+
+# Models whose Meta.indexes are dropped for the "before" run
+INDEXED_MODELS = [Complaint, Response, Result, NominalRoll]
+
+
+def hot_queries(lecturer, department, offerings):
+    """The filters the views run most, keyed by a short label."""
+    unit_codes = [o.unit_id for o in offerings]
+    year_ids = [o.academic_year_id for o in offerings]
+    return {
+        'assigned complaints': Complaint.objects.filter(assigned_lecturer=lecturer, resolved=False),
+        'unassigned complaints': Complaint.objects.filter(
+            unit_offering__unit__department=department, assigned_lecturer__isnull=True
+        ),
+        'pending responses': Response.objects.filter(unit_offering__unit__department=department, approved_by_cod=False),
+        'approved responses': Response.objects.filter(unit_offering__in=offerings, approved_by_cod=True),
+        'lecturer results': Result.objects.filter(unit_code__in=unit_codes, academic_year__in=year_ids),
+        'lecturer nominal roll': NominalRoll.objects.filter(unit_code__in=unit_codes, academic_year__in=year_ids),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database and compare the query plans and timings of the hot "
+        "complaint, response and result filters with and without their indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000, help='Number of students to seed.')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query; the median is reported.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the generated data.')
+
+    def handle(self, *args, **options):
+        # Never touch the real database: migrate a fresh test database and drop it afterwards
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            random.seed(options['seed'])
+            self.stdout.write("Seeding...")
+            lecturer, department, offerings = self.seed(options['students'])
+            queries = hot_queries(lecturer, department, offerings)
+            self.analyze()
+
+            after = self.measure(queries, options['repeat'])
+            with connection.schema_editor() as editor:
+                for model in INDEXED_MODELS:
+                    for index in model._meta.indexes:
+                        editor.remove_index(model, index)
+            self.analyze()
+            before = self.measure(queries, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for label in queries:
+            (before_ms, before_plan), (after_ms, after_plan) = before[label], after[label]
+            speedup = before_ms / after_ms if after_ms else float('inf')
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{label}: {before_ms:.2f} ms -> {after_ms:.2f} ms ({speedup:.1f}x)"
+            ))
+            self.stdout.write(f"  before:\n{self.indent(before_plan)}")
+            self.stdout.write(f"  after:\n{self.indent(after_plan)}")
+
+    def measure(self, queries, repeat):
+        results = {}
+        for label, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.values_list('pk', flat=True))
+                timings.append((time.perf_counter() - start) * 1000)
+            results[label] = (statistics.median(timings), queryset.explain())
+        return results
+
+    def analyze(self):
+        # Give the planner table statistics, as a long-running database would have
+        if connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def indent(self, plan):
+        return '\n'.join(f"    {line}" for line in plan.splitlines())
+
+    def seed(self, student_count):
+        """
+        Generate a school with ten departments, their units offered over three academic years,
+        and complaints, responses, results and nominal roll entries for student_count students.
+        """
+        school = School.objects.create(school_code='BENCH', school_name='Benchmark School')
+        departments = Department.objects.bulk_create([
+            Department(department_code=f'D{d}', department_name=f'Department {d}', school=school) for d in range(10)
+        ])
+        programs = Program.objects.bulk_create([
+            Program(program_code=f'P{d}', program_name=f'Program {d}', level='Degree', department=department)
+            for d, department in enumerate(departments)
+        ])
+        courses = Course.objects.bulk_create([
+            Course(course_code=f'C{d}', course_name=f'Course {d}', program=program) for d, program in enumerate(programs)
+        ])
+        AcademicYear.objects.bulk_create([AcademicYear(academic_year=f'{y}/{y + 1}') for y in range(2021, 2024)])
+        years = list(AcademicYear.objects.all())
+        semesters = {year.pk: Semester.objects.create(semester_number=1, academic_year=year) for year in years}
+        year_of_study = YearOfStudy.objects.create(study_year=1)
+        units = Unit.objects.bulk_create([
+            Unit(unit_code=f'U{d}{u:02d}', unit_name=f'Unit {d}{u:02d}', department=department)
+            for d, department in enumerate(departments) for u in range(20)
+        ])
+        lecturers = Lecturer.objects.bulk_create([
+            Lecturer(
+                employee_no=f'E{d}{n}', email_address=f'e{d}{n}@bench.ac.ke', username=f'e{d}{n}@bench.ac.ke',
+                first_name='Bench', last_name='Lecturer', phone_number='0712345678', department=department,
+                role='Member'
+            )
+            for d, department in enumerate(departments) for n in range(5)
+        ])
+        UnitOffering.objects.bulk_create([
+            UnitOffering(
+                unit=unit, course=courses[u // 20], academic_year=year, semester=semesters[year.pk],
+                year_of_study=year_of_study, lecturer=lecturers[u // 4]
+            )
+            for u, unit in enumerate(units) for year in years
+        ])
+        offerings = list(UnitOffering.objects.all())
+        students = Student.objects.bulk_create([
+            Student(
+                reg_no=f'BEN/B/01-{s:05d}/2023', username=f'ben{s}', first_name='Bench', last_name='Student',
+                email_address=f'ben{s}@bench.ac.ke', phone_number='0712345678',
+                program=programs[s % 10], course=courses[s % 10]
+            )
+            for s in range(student_count)
+        ])
+
+        complaints, responses, results, rolls = [], [], [], []
+        for s, student in enumerate(students):
+            for offering in random.sample(offerings, 4):
+                rolls.append(NominalRoll(unit_code_id=offering.unit_id, reg_no=student, academic_year_id=offering.academic_year_id))
+                results.append(Result(
+                    unit_code_id=offering.unit_id, reg_no=student, academic_year_id=offering.academic_year_id,
+                    cat=random.randint(0, 30), exam=random.randint(0, 70)
+                ))
+            offering = random.choice(offerings)
+            complaints.append(Complaint(
+                complaint_code=f'B{s:07d}', student=student, unit_offering=offering, missing_type='CAT',
+                assigned_lecturer=offering.lecturer if random.random() < 0.7 else None,
+                resolved=random.random() < 0.5
+            ))
+            responses.append(Response(
+                student=student, unit_offering=offering, academic_year_id=offering.academic_year_id,
+                cat_mark=random.randint(0, 30), approved_by_cod=random.random() < 0.8
+            ))
+        NominalRoll.objects.bulk_create(rolls, batch_size=1000, ignore_conflicts=True)
+        Result.objects.bulk_create(results, batch_size=1000, ignore_conflicts=True)
+        Complaint.objects.bulk_create(complaints, batch_size=1000)
+        Response.objects.bulk_create(responses, batch_size=1000)
+
+        lecturer = lecturers[0]
+        return lecturer, lecturer.department, [o for o in offerings if o.lecturer_id == lecturer.pk]
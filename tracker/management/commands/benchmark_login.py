@@ -0,0 +1,119 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from tracker.models import School, Department, Lecturer, System_User
+from tracker.passwords import calibrate_pbkdf2_iterations, hash_cost, system_user_hasher
+
+USERNAME = 'bench@mmust.ac.ke'
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    help = (
+        "Log in repeatedly against a throwaway test database under each System_User hashing policy "
+        "and report what one authentication costs, to size workers for login peaks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50, help='Logins timed per policy.')
+        parser.add_argument(
+            '--algorithm', action='append', default=[],
+            help='Also measure this hasher algorithm with its default work factor (repeatable), e.g. argon2.'
+        )
+        parser.add_argument(
+            '--target-ms', type=float,
+            help='Also measure PBKDF2 calibrated so that checking a password takes about this long.'
+        )
+        parser.add_argument('--report', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        policies = [('configured', None, None)]
+        policies += [(algorithm, algorithm, {}) for algorithm in options['algorithm']]
+        if options['target_ms']:
+            iterations = calibrate_pbkdf2_iterations(options['target_ms'])
+            policies.append((f'pbkdf2_sha256 x{iterations}', 'pbkdf2_sha256', {'iterations': iterations}))
+
+        # Never touch the real database: migrate a fresh test database and drop it afterwards
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.seed()
+            results = {label: self.measure(algorithm, params, options['logins']) for label, algorithm, params in policies}
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for label, result in results.items():
+            if 'error' in result:
+                self.stdout.write(self.style.WARNING(f"{label}: unavailable ({result['error']})"))
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{label} ({result['hasher']})"))
+            self.stdout.write(
+                f"  password check {result['hash_ms']:.1f} ms, login median {result['median_ms']:.1f} ms, "
+                f"p95 {result['p95_ms']:.1f} ms, first login with rehash {result['rehash_ms']:.1f} ms"
+            )
+            self.stdout.write(f"  about {result['logins_per_second']:.1f} logins per second per worker process")
+
+        if options['report']:
+            with open(options['report'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+    def seed(self):
+        school = School.objects.create(school_code='BENCH', school_name='Benchmark School')
+        department = Department.objects.create(department_code='D0', department_name='Department 0', school=school)
+        Lecturer.objects.create(
+            employee_no='E0', email_address=USERNAME, username=USERNAME, first_name='Bench', last_name='Lecturer',
+            phone_number='0712345678', department=department, role='Member'
+        )
+        System_User.objects.create(username=USERNAME)
+
+    def measure(self, algorithm, params, logins):
+        overrides = {}
+        if algorithm is not None:
+            overrides = {'SYSTEM_USER_PASSWORD_HASHER': algorithm, 'SYSTEM_USER_HASHER_PARAMS': params}
+        with override_settings(**overrides):
+            try:
+                hasher = system_user_hasher()
+                cost = hash_cost(hasher)
+            except ValueError as e:
+                # e.g. argon2-cffi or bcrypt is not installed
+                return {'error': str(e)}
+
+            client = Client()
+            # A password stored by a cheaper, older policy is upgraded on the first login
+            System_User.objects.filter(pk=USERNAME).update(
+                password_hash=system_user_hasher('pbkdf2_sha1', {'iterations': 1000}).encode(PASSWORD, 'benchsalt')
+            )
+            rehash_ms = self.log_in(client)
+            timings = sorted(self.log_in(client) for _ in range(logins))
+
+        median = timings[len(timings) // 2]
+        return {
+            'hasher': f"{hasher.algorithm} {self.work_factor(hasher)}",
+            'hash_ms': round(cost, 2),
+            'rehash_ms': round(rehash_ms, 2),
+            'median_ms': round(median, 2),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+            'logins_per_second': round(1000 / median, 1),
+        }
+
+    def log_in(self, client):
+        client.logout()
+        start = time.perf_counter()
+        response = client.post(reverse('login'), {'username': USERNAME, 'password': PASSWORD})
+        elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code != 302:
+            raise RuntimeError('The benchmark login was rejected.')
+        return elapsed
+
+    def work_factor(self, hasher):
+        names = ['iterations', 'time_cost', 'memory_cost', 'parallelism', 'rounds', 'work_factor']
+        return ', '.join(f"{name}={getattr(hasher, name)}" for name in names if hasattr(hasher, name))
@@ -0,0 +1,105 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from tracker.budgets import URL_BUDGETS, budget_label, make_fixtures, measure
+from tracker.models import Lecturer, Student
+from tracker.search import rebuild_search_index
+from tracker.stats import rebuild_dashboard_stats
+
+from .benchmark_indexes import Command as IndexBenchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database, request every tracker URL as each role and check its "
+        "query count and p95 latency against tracker.budgets. Exits with an error when a budget is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=5000, help='Number of students to seed.')
+        parser.add_argument('--repeat', type=int, default=20, help='Requests per URL; the p95 is reported.')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the generated data.')
+        parser.add_argument('--report', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='A report from an earlier run to show the changes against.')
+
+    def handle(self, *args, **options):
+        previous = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                previous = json.load(f)['urls']
+
+        # Never touch the real database: migrate a fresh test database and drop it afterwards
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            random.seed(options['seed'])
+            self.stdout.write("Seeding...")
+            fixtures = self.seed(options['students'])
+            IndexBenchmark().analyze()
+
+            client = Client()
+            results = {}
+            for budget in URL_BUDGETS:
+                result = measure(client, budget, fixtures, options['repeat'])
+                result.update({
+                    'role': budget.role,
+                    'query_budget': budget.queries,
+                    'p95_budget_ms': budget.p95_ms,
+                    'ok': (
+                        result['status'] == budget.status and result['queries'] <= budget.queries
+                        and result['p95_ms'] <= budget.p95_ms
+                    ),
+                })
+                results[budget_label(budget)] = result
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        for label, result in results.items():
+            self.write_result(label, result, previous.get(label) if previous else None)
+
+        if options['report']:
+            report = {'students': options['students'], 'repeat': options['repeat'], 'urls': results}
+            with open(options['report'], 'w') as f:
+                # Sorted and indented so two reports diff line by line
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
+
+        over = [label for label, result in results.items() if not result['ok']]
+        if over:
+            raise CommandError(f"Over budget: {', '.join(over)}")
+
+    def write_result(self, label, result, previous):
+        line = (
+            f"{label} [{result['role'] or 'anonymous'}]: {result['status']}, "
+            f"{result['queries']}/{result['query_budget']} queries, "
+            f"p95 {result['p95_ms']:.2f}/{result['p95_budget_ms']} ms"
+        )
+        if previous:
+            line += (
+                f" (was {previous['queries']} queries, p95 {previous['p95_ms']:.2f} ms)"
+            )
+        style = self.style.SUCCESS if result['ok'] else self.style.ERROR
+        self.stdout.write(style(line))
+
+    def seed(self, student_count):
+        """Seed the index benchmark's data set and pick a department's lecturers for each role."""
+        member, department, offerings = IndexBenchmark().seed(student_count)
+        colleagues = list(Lecturer.objects.filter(department=department).exclude(pk=member.pk))
+        exam_officer, cod = colleagues[0], colleagues[1]
+        Lecturer.objects.filter(pk=exam_officer.pk).update(role='Exam Officer')
+        Lecturer.objects.filter(pk=cod.pk).update(role='COD')
+        exam_officer.role, cod.role = 'Exam Officer', 'COD'
+
+        # The seed bulk-creates its rows, so no signal has filled the counters or search index
+        rebuild_dashboard_stats()
+        rebuild_search_index()
+
+        student = Student.objects.filter(course=offerings[0].course).exclude(complaint__unit_offering=offerings[0]).first()
+        return make_fixtures(member, exam_officer, cod, offerings[0], student)
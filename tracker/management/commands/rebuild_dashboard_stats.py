@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tracker.stats import rebuild_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored dashboard counters of every department and lecturer."
+
+    def handle(self, *args, **options):
+        rebuild_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS("Dashboard counters rebuilt."))
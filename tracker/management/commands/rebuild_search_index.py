@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tracker.search import rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = "Refill the full-text search tables for results, nominal rolls and complaints, e.g. after bulk changes."
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            self.stdout.write("Full-text search is only available on SQLite; nothing to rebuild.")
+            return
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.jobs import fail_abandoned_jobs, run_job
+from tracker.models import UploadJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued upload jobs. Use with JOB_RUNNER = 'process' or to drain jobs left queued after a "
+        "restart. Jobs left running by a worker that died are marked failed once JOB_LEASE_TIMEOUT passes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when the queue is empty.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait between polls.')
+
+    def handle(self, *args, **options):
+        while True:
+            abandoned = fail_abandoned_jobs()
+            if abandoned:
+                self.stdout.write(f"Failed {abandoned} abandoned upload job(s)")
+
+            job_ids = list(
+                UploadJob.objects.filter(status='queued').order_by('created_at').values_list('job_id', flat=True)[:10]
+            )
+            for job_id in job_ids:
+                run_job(job_id)
+                self.stdout.write(f"Ran upload job {job_id}")
+
+            if not job_ids:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
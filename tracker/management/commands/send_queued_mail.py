@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.outbox import send_due_mail
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued outbox email. Use with MAIL_RUNNER = 'process', or to deliver messages "
+        "whose retry has come due while no request woke the sender."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when no message is due.')
+        parser.add_argument('--interval', type=float, default=10.0, help='Seconds to wait between polls.')
+        parser.add_argument('--batch-size', type=int, help='Messages claimed at a time (default OUTBOX_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_due_mail(options['batch_size'])
+            if sent:
+                self.stdout.write(f"Sent {sent} queued messages")
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
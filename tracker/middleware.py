@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+
+from .models import Lecturer
+
+
+def lecturer_cache_key(username):
+    return f'tracker:lecturer:{username}'
+
+
+def get_lecturer(request):
+    """
+    Return the logged-in lecturer with department and school loaded in one query,
+    or None. Lookups are cached for settings.LECTURER_CACHE_TTL seconds (0 disables).
+    """
+    username = request.session.get('username')
+    if not username:
+        return None
+
+    ttl = getattr(settings, 'LECTURER_CACHE_TTL', 0)
+    if ttl:
+        lecturer = cache.get(lecturer_cache_key(username))
+        if lecturer is not None:
+            return lecturer
+
+    lecturer = Lecturer.objects.select_related('department__school').filter(username=username).first()
+    if ttl and lecturer is not None:
+        cache.set(lecturer_cache_key(username), lecturer, ttl)
+    return lecturer
+
+
+def get_lecturer_or_404(request, role=None):
+    lecturer = request.lecturer
+    if lecturer is None or (role and lecturer.role != role):
+        raise Http404("Lecturer not found")
+    return lecturer
+
+
+class LecturerMiddleware:
+    """Attach the logged-in lecturer to every request as request.lecturer."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.lecturer = get_lecturer(request)
+        return self.get_response(request)
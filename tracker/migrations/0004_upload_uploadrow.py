@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0003_response_academic_year_response_student_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('upload_id', models.AutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('nominal_roll', 'Nominal Roll'), ('result', 'Result')], max_length=20)),
+                ('rejection_report', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UploadRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row', models.PositiveIntegerField(help_text='Row number in the uploaded sheet')),
+                ('cat', models.IntegerField(blank=True, null=True)),
+                ('exam', models.IntegerField(blank=True, null=True)),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tracker.academicyear')),
+                ('reg_no', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tracker.student')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='uploadrow',
+            name='unit_code',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='tracker.unit'),
+        ),
+        migrations.AddField(
+            model_name='uploadrow',
+            name='upload',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='tracker.upload'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0005_uploadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentStats',
+            fields=[
+                ('department', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='tracker.department')),
+                ('total_students', models.IntegerField(default=0)),
+                ('total_lecturers_in_department', models.IntegerField(default=0)),
+                ('department_complaints_count', models.IntegerField(default=0)),
+                ('pending_responses_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LecturerStats',
+            fields=[
+                ('lecturer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='tracker.lecturer')),
+                ('total_units_for_lecturer', models.IntegerField(default=0)),
+                ('assigned_complaints_count', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0006_departmentstats_lecturerstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(fields=['assigned_lecturer', 'resolved'], name='complaint_lecturer_open_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(condition=models.Q(('assigned_lecturer__isnull', True)), fields=['unit_offering'], name='complaint_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nominalroll',
+            index=models.Index(fields=['unit_code', 'academic_year'], name='nominal_roll_unit_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['unit_offering', 'approved_by_cod'], name='response_offering_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['unit_code', 'academic_year'], name='result_unit_year_idx'),
+        ),
+    ]
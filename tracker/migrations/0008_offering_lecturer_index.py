@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0007_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='unitoffering',
+            index=models.Index(fields=['lecturer', 'unit', 'academic_year'], name='offering_lecturer_pair_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+COLUMNS = 'reg_no, reg_no_parts, student_name, unit_code, unit_name, academic_year'
+
+MARKS_SOURCE = """
+    SELECT t.rowid, s.reg_no, replace(replace(s.reg_no, '/', ' '), '-', ' '),
+           s.first_name || ' ' || s.last_name, u.unit_code, u.unit_name, y.academic_year
+    FROM {table} t
+    JOIN tracker_student s ON s.reg_no = t.reg_no_id
+    JOIN tracker_unit u ON u.unit_code = t.unit_code_id
+    JOIN tracker_academicyear y ON y.year_id = t.academic_year_id
+"""
+
+SEARCH_TABLES = {
+    'tracker_result_search': MARKS_SOURCE.format(table='tracker_result'),
+    'tracker_nominalroll_search': MARKS_SOURCE.format(table='tracker_nominalroll'),
+    'tracker_complaint_search': """
+        SELECT t.rowid, s.reg_no, replace(replace(s.reg_no, '/', ' '), '-', ' '),
+               s.first_name || ' ' || s.last_name, u.unit_code, u.unit_name, y.academic_year
+        FROM tracker_complaint t
+        JOIN tracker_student s ON s.reg_no = t.student_id
+        JOIN tracker_unitoffering o ON o.offering_id = t.unit_offering_id
+        JOIN tracker_unit u ON u.unit_code = o.unit_id
+        JOIN tracker_academicyear y ON y.year_id = o.academic_year_id
+    """,
+}
+
+
+def create_search_tables(apps, schema_editor):
+    # FTS5 is SQLite only; other databases search with icontains, see tracker.search
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, source in SEARCH_TABLES.items():
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {table} USING fts5({COLUMNS}, tokenize = \"unicode61 tokenchars '/-'\", prefix = '2 3')"
+        )
+        schema_editor.execute(f"INSERT INTO {table} (rowid, {COLUMNS}) {source}")
+
+
+def drop_search_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in SEARCH_TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_offering_lecturer_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_tables, drop_search_tables),
+    ]
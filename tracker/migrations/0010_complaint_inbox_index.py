@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='complaint',
+            name='complaint_lecturer_open_idx',
+        ),
+        migrations.AddIndex(
+            model_name='complaint',
+            index=models.Index(condition=models.Q(('resolved', False)), fields=['assigned_lecturer', 'submitted_at', 'complaint_code'], name='complaint_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 07:58
+
+from django.db import migrations, models
+
+
+def drop_duplicate_complaints(apps, schema_editor):
+    # Concurrent submissions could get past the old exists() check; keep each student's first
+    # complaint about an offering so the constraint can be added
+    Complaint = apps.get_model('tracker', 'Complaint')
+    seen = set()
+    duplicates = []
+    for code, student, offering in Complaint.objects.order_by('submitted_at', 'complaint_code').values_list(
+        'complaint_code', 'student', 'unit_offering'
+    ).iterator():
+        if (student, offering) in seen:
+            duplicates.append(code)
+        seen.add((student, offering))
+    Complaint.objects.filter(complaint_code__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_code_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_complaints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='complaint',
+            constraint=models.UniqueConstraint(fields=('student', 'unit_offering'), name='unique_complaint_per_student_offering'),
+        ),
+    ]
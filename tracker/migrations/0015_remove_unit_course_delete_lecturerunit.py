@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-17 08:29
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_uploadjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='unit',
+            name='course',
+        ),
+        migrations.DeleteModel(
+            name='LecturerUnit',
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+
+COLUMNS = 'reg_no, reg_no_parts, student_name, unit_code, unit_name, academic_year'
+OPTIONS = "tokenize = \"unicode61 tokenchars '/-'\", prefix = '2 3'"
+
+COMPLAINT_SOURCE = """
+    SELECT t.{key}, s.reg_no, replace(replace(s.reg_no, '/', ' '), '-', ' '),
+           s.first_name || ' ' || s.last_name, u.unit_code, u.unit_name, y.academic_year
+    FROM tracker_complaint t
+    JOIN tracker_student s ON s.reg_no = t.student_id
+    JOIN tracker_unitoffering o ON o.offering_id = t.unit_offering_id
+    JOIN tracker_unit u ON u.unit_code = o.unit_id
+    JOIN tracker_academicyear y ON y.year_id = o.academic_year_id
+"""
+
+
+def key_by_complaint_code(apps, schema_editor):
+    # Complaints have a varchar primary key, so their implicit rowid may change on VACUUM
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS tracker_complaint_search")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE tracker_complaint_search USING fts5(complaint_code UNINDEXED, {COLUMNS}, {OPTIONS})"
+    )
+    schema_editor.execute(
+        f"INSERT INTO tracker_complaint_search (complaint_code, {COLUMNS}) {COMPLAINT_SOURCE.format(key='complaint_code')}"
+    )
+
+
+def key_by_rowid(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS tracker_complaint_search")
+    schema_editor.execute(f"CREATE VIRTUAL TABLE tracker_complaint_search USING fts5({COLUMNS}, {OPTIONS})")
+    schema_editor.execute(f"INSERT INTO tracker_complaint_search (rowid, {COLUMNS}) {COMPLAINT_SOURCE.format(key='rowid')}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0015_remove_unit_course_delete_lecturerunit'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_by_complaint_code, key_by_rowid),
+    ]
@@ -0,0 +1,58 @@
+from django.db import migrations
+
+COLUMNS = 'reg_no, reg_no_parts, student_name, unit_code, unit_name, academic_year'
+OPTIONS = "tokenize = \"unicode61 tokenchars '/-'\", prefix = '2 3'"
+
+COMPLAINT_SOURCE = """
+    SELECT {key}, s.reg_no, replace(replace(s.reg_no, '/', ' '), '-', ' '),
+           s.first_name || ' ' || s.last_name, u.unit_code, u.unit_name, y.academic_year
+    FROM tracker_complaint t
+    {join}
+    JOIN tracker_student s ON s.reg_no = t.student_id
+    JOIN tracker_unitoffering o ON o.offering_id = t.unit_offering_id
+    JOIN tracker_unit u ON u.unit_code = o.unit_id
+    JOIN tracker_academicyear y ON y.year_id = o.academic_year_id
+"""
+
+
+def key_by_search_rowid(apps, schema_editor):
+    # FTS5 can only look rows up by rowid, so each complaint gets a stable one in a side table
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS tracker_complaint_search")
+    schema_editor.execute(
+        "CREATE TABLE tracker_complaint_search_key ("
+        "search_rowid INTEGER PRIMARY KEY, complaint_code varchar(100) NOT NULL UNIQUE)"
+    )
+    schema_editor.execute(
+        "INSERT INTO tracker_complaint_search_key (complaint_code) SELECT complaint_code FROM tracker_complaint"
+    )
+    schema_editor.execute(f"CREATE VIRTUAL TABLE tracker_complaint_search USING fts5({COLUMNS}, {OPTIONS})")
+    source = COMPLAINT_SOURCE.format(
+        key='k.search_rowid',
+        join='JOIN tracker_complaint_search_key k ON k.complaint_code = t.complaint_code',
+    )
+    schema_editor.execute(f"INSERT INTO tracker_complaint_search (rowid, {COLUMNS}) {source}")
+
+
+def key_by_complaint_code(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS tracker_complaint_search")
+    schema_editor.execute("DROP TABLE IF EXISTS tracker_complaint_search_key")
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE tracker_complaint_search USING fts5(complaint_code UNINDEXED, {COLUMNS}, {OPTIONS})"
+    )
+    source = COMPLAINT_SOURCE.format(key='t.complaint_code', join='')
+    schema_editor.execute(f"INSERT INTO tracker_complaint_search (complaint_code, {COLUMNS}) {source}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0016_complaint_search_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(key_by_search_rowid, key_by_complaint_code),
+    ]
@@ -6,6 +6,7 @@ import string
 from datetime import timedelta
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password, check_password
+from .passwords import system_user_hasher
 from .validators import validate_reg_no, validate_kenyan_phone_number
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
@@ -65,8 +66,7 @@ class Semester(models.Model):
     academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE)
     
     def __str__(self):
-        return f"{self.semester_number}"
-    def __str__(self):
+        # Reads academic_year; load it with select_related when listing semesters
         return f"{self.semester_number} - {self.academic_year}"
 
 class YearOfStudy(models.Model):
@@ -120,6 +120,12 @@ class UnitOffering(models.Model):
     semester = models.ForeignKey(Semester, on_delete=models.CASCADE)
     year_of_study = models.ForeignKey(YearOfStudy, on_delete=models.CASCADE)
     lecturer = models.ForeignKey(Lecturer, null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        indexes = [
+            # Covers the (unit, academic year) pairs a lecturer teaches, see views.taught_by
+            models.Index(fields=['lecturer', 'unit', 'academic_year'], name='offering_lecturer_pair_idx'),
+        ]
     
     def __str__(self):
         return f"{self.unit} - {self.course} - {self.academic_year}"
@@ -139,6 +145,9 @@ class NominalRoll(models.Model):
                 name='unique_nominal_roll_per_unit_student_year'
             )
         ]
+        indexes = [
+            models.Index(fields=['unit_code', 'academic_year'], name='nominal_roll_unit_year_idx'),
+        ]
 
     def __str__(self):
         return f"{self.reg_no} - {self.unit_code} - {self.academic_year}"
@@ -175,6 +184,9 @@ class Result(models.Model):
                 name='unique_result_per_unit_student_year'
             )
         ]
+        indexes = [
+            models.Index(fields=['unit_code', 'academic_year'], name='result_unit_year_idx'),
+        ]
 
     @property
     def total(self):
@@ -196,7 +208,98 @@ class Result(models.Model):
         # Call clean method to perform validations before saving
         self.clean()
         super().save(*args, **kwargs)
+
+
+class Upload(models.Model):
+    """A validated nominal roll or result sheet waiting to be submitted."""
+    upload_id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=[
+        ('nominal_roll', 'Nominal Roll'),
+        ('result', 'Result')
+    ])
+    rejection_report = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} upload {self.upload_id}"
+
+class UploadRow(models.Model):
+    """An accepted row of an Upload, with its keys already resolved."""
+    upload = models.ForeignKey(Upload, on_delete=models.CASCADE, related_name='rows')
+    row = models.PositiveIntegerField(help_text="Row number in the uploaded sheet")
+    unit_code = models.ForeignKey(Unit, on_delete=models.CASCADE)
+    reg_no = models.ForeignKey(Student, on_delete=models.CASCADE)
+    academic_year = models.ForeignKey(AcademicYear, on_delete=models.CASCADE)
+    cat = models.IntegerField(null=True, blank=True)
+    exam = models.IntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.reg_no_id} - {self.unit_code_id} - {self.academic_year_id}"
+
+class UploadJob(models.Model):
+    """Background validation or submission of an Upload, polled for progress."""
+    job_id = models.AutoField(primary_key=True)
+    action = models.CharField(max_length=20, choices=[
+        ('validate', 'Validate'),
+        ('commit', 'Commit')
+    ])
+    upload = models.ForeignKey(Upload, null=True, blank=True, on_delete=models.SET_NULL, related_name='jobs')
+    lecturer = models.ForeignKey(Lecturer, on_delete=models.CASCADE)
+    file = models.FileField(upload_to='uploads/', blank=True)
+    status = models.CharField(max_length=20, default='queued', choices=[
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ])
+    processed = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    committed = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Refreshed by the worker while it runs the job, see tracker.jobs.fail_abandoned_jobs
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.action} job {self.job_id} - {self.status}"
+
+
+
+class OutboxMessage(models.Model):
+    """An email waiting to be sent by tracker.outbox, retried with backoff until it goes out."""
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=20, default='queued', choices=[
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed')
+    ])
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a queued message is next due; a sender claiming it pushes this forward as a lease
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} - {self.status}"
         
+class ComplaintQuerySet(models.QuerySet):
+    def inbox(self, lecturer):
+        """A lecturer's unresolved complaints, oldest first, with the student and unit joined."""
+        return self.filter(assigned_lecturer=lecturer, resolved=False).select_related(
+            'student', 'unit_offering__unit'
+        ).order_by('submitted_at')
+
+
 class Complaint(models.Model):
     complaint_code = models.CharField(
         max_length=100,
@@ -217,11 +320,48 @@ class Complaint(models.Model):
         on_delete=models.SET_NULL, related_name='assigned_complaints'
     )
     resolved = models.BooleanField(default=False)
+
+    objects = ComplaintQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # One complaint per student per offering, enforced by the database at insert time
+            models.UniqueConstraint(fields=['student', 'unit_offering'], name='unique_complaint_per_student_offering'),
+        ]
+        indexes = [
+            # A lecturer's open complaints in the inbox's keyset order, so a page is an index range scan
+            models.Index(
+                fields=['assigned_lecturer', 'submitted_at', 'complaint_code'], condition=models.Q(resolved=False),
+                name='complaint_inbox_idx'
+            ),
+            # The COD inbox only ever looks at complaints nobody has been assigned yet
+            models.Index(
+                fields=['unit_offering'], condition=models.Q(assigned_lecturer__isnull=True),
+                name='complaint_unassigned_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.complaint_code} - {self.student} - {self.missing_type}"
         
 
+class CodeCounter(models.Model):
+    """A named counter handed out in blocks, e.g. the sequence behind complaint codes or a cache version."""
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class ResponseQuerySet(models.QuerySet):
+    def listing(self):
+        """Join everything a response list shows per row: the student, unit and both academic years."""
+        return self.select_related(
+            'student', 'academic_year', 'unit_offering__unit', 'unit_offering__academic_year'
+        )
+
+
 class Response(models.Model):
     response_id = models.AutoField(primary_key=True, unique=True)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
@@ -232,6 +372,13 @@ class Response(models.Model):
     response_date = models.DateTimeField(auto_now_add=True)
     comment_by_cod = models.TextField(null=True, blank=True)
     approved_by_cod = models.BooleanField(default=False)
+
+    objects = ResponseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['unit_offering', 'approved_by_cod'], name='response_offering_approved_idx'),
+        ]
     
     # Django automatically adds an 'id' primary key by default
     # No need to explicitly define the primary key field
@@ -240,15 +387,41 @@ class Response(models.Model):
         return f"{self.comment_by_cod} - {self.approved_by_cod}"
 
 
+class DepartmentStats(models.Model):
+    """Dashboard counters for a department, kept up to date by tracker.signals."""
+    department = models.OneToOneField(Department, primary_key=True, on_delete=models.CASCADE, related_name='stats')
+    total_students = models.IntegerField(default=0)
+    total_lecturers_in_department = models.IntegerField(default=0)
+    department_complaints_count = models.IntegerField(default=0)
+    pending_responses_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for {self.department_id}"
+
+class LecturerStats(models.Model):
+    """Dashboard counters for a lecturer, kept up to date by tracker.signals."""
+    lecturer = models.OneToOneField(Lecturer, primary_key=True, on_delete=models.CASCADE, related_name='stats')
+    total_units_for_lecturer = models.IntegerField(default=0)
+    assigned_complaints_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for {self.lecturer_id}"
+
+
 class System_User(models.Model):
     username = models.CharField(primary_key=True, unique=True, max_length=50, help_text="Enter a valid Username")
     password_hash = models.CharField(max_length=128, help_text="Enter a valid password")  # Store hashed password
 
     def set_password(self, raw_password):
-        self.password_hash = make_password(raw_password)
+        self.password_hash = make_password(raw_password, hasher=system_user_hasher())
 
     def check_password(self, raw_password):
-        return check_password(raw_password, self.password_hash)
+        """Check the password, rehashing it under the current policy if it was hashed under another."""
+        def rehash(raw_password):
+            self.set_password(raw_password)
+            System_User.objects.filter(pk=self.pk).update(password_hash=self.password_hash)
+
+        return check_password(raw_password, self.password_hash, setter=rehash, preferred=system_user_hasher())
 
     def clean(self):
         # Custom validation for password field
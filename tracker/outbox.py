@@ -0,0 +1,152 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+_sender = None
+# The timer that wakes the sender for the next retry, and when it fires
+_retry_timer = None
+_retry_due = None
+_retry_lock = threading.Lock()
+
+
+def queue_mail(subject, body, recipients, from_email=''):
+    """
+    Store an email in the outbox and wake the sender configured by settings.MAIL_RUNNER:
+
+    - 'thread' (default): send it from a background thread in this process once the
+      surrounding transaction commits. While messages are waiting to be retried the thread
+      wakes itself when the earliest falls due; run send_queued_mail after a restart to pick
+      up retries left by the previous process.
+    - 'process': leave it for the send_queued_mail management command.
+    - 'sync': send it before returning, e.g. in tests.
+    """
+    message = OutboxMessage.objects.create(
+        subject=subject, body=body, recipients=list(recipients), from_email=from_email or ''
+    )
+    runner = getattr(settings, 'MAIL_RUNNER', 'thread')
+    if runner == 'sync':
+        send_due_mail()
+    elif runner == 'thread':
+        transaction.on_commit(lambda: _get_sender().submit(_send_in_thread))
+    return message
+
+
+def _get_sender():
+    global _sender
+    if _sender is None:
+        # One thread, so a burst of queued messages is drained over a single connection
+        _sender = ThreadPoolExecutor(max_workers=1, thread_name_prefix='outbox')
+    return _sender
+
+
+def _send_in_thread():
+    try:
+        send_due_mail()
+        _wake_for_retries()
+    except Exception:
+        logger.exception('Sending queued mail failed')
+    finally:
+        # The sender thread has its own database connection
+        connection.close()
+
+
+def _wake_for_retries():
+    """Run the sender thread again when the earliest message still queued falls due."""
+    global _retry_timer, _retry_due
+    due = (
+        OutboxMessage.objects.filter(status='queued')
+        .order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+    )
+    if due is None:
+        return
+    with _retry_lock:
+        if _retry_timer is not None and _retry_timer.is_alive():
+            if _retry_due <= due:
+                return
+            _retry_timer.cancel()
+        delay = max(0, (due - timezone.now()).total_seconds())
+        _retry_timer = threading.Timer(delay, lambda: _get_sender().submit(_send_in_thread))
+        _retry_timer.daemon = True
+        _retry_due = due
+        _retry_timer.start()
+
+
+def send_due_mail(batch_size=None):
+    """
+    Send every queued message that is due, batch_size at a time (OUTBOX_BATCH_SIZE by default),
+    over one mail connection. Returns the number of messages sent.
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+    mail_connection = None
+    sent = 0
+    try:
+        while True:
+            batch = _claim_batch(batch_size)
+            if not batch:
+                break
+            if mail_connection is None:
+                mail_connection = get_connection()
+                try:
+                    mail_connection.open()
+                except Exception as e:
+                    # The server is unreachable: nothing in the batch can go out this time
+                    for message in batch:
+                        _retry_later(message, e)
+                    mail_connection = None
+                    break
+            for message in batch:
+                try:
+                    mail_connection.send_messages([EmailMessage(
+                        message.subject, message.body, message.from_email or None, message.recipients,
+                        connection=mail_connection,
+                    )])
+                except Exception as e:
+                    _retry_later(message, e)
+                else:
+                    OutboxMessage.objects.filter(pk=message.pk).update(
+                        status='sent', attempts=message.attempts + 1, sent_at=timezone.now(), error=''
+                    )
+                    sent += 1
+    finally:
+        if mail_connection is not None:
+            mail_connection.close()
+    return sent
+
+
+def _claim_batch(batch_size):
+    """
+    Claim up to batch_size due messages by moving their next_attempt_at past OUTBOX_CLAIM_TIMEOUT,
+    so no other sender picks them up meanwhile and a sender that dies mid-batch only delays them.
+    """
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_TIMEOUT', 600))
+    due = list(
+        OutboxMessage.objects.filter(status='queued', next_attempt_at__lte=now)
+        .order_by('next_attempt_at', 'pk').values_list('pk', flat=True)[:batch_size]
+    )
+    OutboxMessage.objects.filter(pk__in=due, status='queued', next_attempt_at__lte=now).update(next_attempt_at=lease)
+    # Rows another sender claimed in between carry that sender's lease, not ours
+    return list(OutboxMessage.objects.filter(pk__in=due, status='queued', next_attempt_at=lease).order_by('pk'))
+
+
+def _retry_later(message, error):
+    """Schedule the message again after an exponential backoff, or give up after OUTBOX_MAX_ATTEMPTS."""
+    attempts = message.attempts + 1
+    if attempts >= getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5):
+        logger.warning('Giving up on outbox message %s after %s attempts: %s', message.pk, attempts, error)
+        OutboxMessage.objects.filter(pk=message.pk).update(status='failed', attempts=attempts, error=str(error))
+        return
+    delay = getattr(settings, 'OUTBOX_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+    OutboxMessage.objects.filter(pk=message.pk).update(
+        attempts=attempts, error=str(error), next_attempt_at=timezone.now() + timedelta(seconds=delay)
+    )
@@ -0,0 +1,185 @@
+from datetime import date, datetime
+from functools import cached_property
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, with opaque tokens for its neighbours."""
+
+    def __init__(self, object_list, paginator, next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return self.previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by the value of its sort column and primary key instead of OFFSET,
+    so every page costs the same however deep it is.
+
+    The queryset's first order_by() field is used as the sort column when it is a field of
+    the model itself or an annotation, otherwise rows are paged by primary key alone. Rows may
+    be model instances or values() dicts that include 'pk' and the sort column. count_mode is 'exact' for a full
+    COUNT(*) or 'estimate' to stop counting at count_limit rows.
+    """
+    salt = 'tracker.pagination'
+
+    def __init__(self, queryset, per_page, count_mode='exact', count_limit=1000):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.count_mode = count_mode
+        self.count_limit = count_limit
+        self.sort, self.sort_attname, self.descending = self._sort_field(queryset)
+
+    def _sort_field(self, queryset):
+        """Return (name, attribute on an instance, descending); name is None for the primary key."""
+        ordering = [o for o in queryset.query.order_by if isinstance(o, str)]
+        if not ordering:
+            return None, None, False
+        name, descending = ordering[0].lstrip('-'), ordering[0].startswith('-')
+        if name == 'pk':
+            return None, None, descending
+        if name in queryset.query.annotations:
+            return name, name, descending
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None, None, False
+        if field.primary_key:
+            return None, None, descending
+        if field.concrete and not field.many_to_many:
+            return field.name, field.attname, descending
+        return None, None, False
+
+    @cached_property
+    def count(self):
+        if self.count_mode == 'estimate':
+            return self.queryset.order_by()[:self.count_limit].count()
+        return self.queryset.count()
+
+    @property
+    def count_is_estimate(self):
+        return self.count_mode == 'estimate' and self.count >= self.count_limit
+
+    def page(self, token=None):
+        """Return the page a token points at, or the first page for a missing or invalid token."""
+        cursor = self._decode(token)
+        backward = bool(cursor and cursor['previous'])
+        descending = self.descending != backward
+
+        queryset = self._ordered(descending)
+        if cursor:
+            queryset = queryset.filter(self._after(cursor['value'], cursor['pk'], descending))
+
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backward:
+            rows.reverse()
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, cursor is not None
+
+        return KeysetPage(
+            rows, self,
+            next_token=self._encode(rows[-1], previous=False) if rows and has_next else None,
+            previous_token=self._encode(rows[0], previous=True) if rows and has_previous else None,
+        )
+
+    def _ordered(self, descending):
+        # NULLs sort first ascending and last descending on every backend, so the two
+        # directions are exact mirrors of each other
+        name = self.sort
+        if name is None:
+            return self.queryset.order_by('-pk' if descending else 'pk')
+        if descending:
+            return self.queryset.order_by(F(name).desc(nulls_last=True), '-pk')
+        return self.queryset.order_by(F(name).asc(nulls_first=True), 'pk')
+
+    def _after(self, value, pk, descending):
+        """Rows that come after (value, pk) in the given direction."""
+        name = self.sort
+        if name is None:
+            return Q(pk__lt=pk) if descending else Q(pk__gt=pk)
+        if descending:
+            if value is None:
+                return Q(**{f'{name}__isnull': True, 'pk__lt': pk})
+            return (
+                Q(**{f'{name}__lt': value}) | Q(**{name: value, 'pk__lt': pk}) | Q(**{f'{name}__isnull': True})
+            )
+        if value is None:
+            return Q(**{f'{name}__isnull': True, 'pk__gt': pk}) | Q(**{f'{name}__isnull': False})
+        return Q(**{f'{name}__gt': value}) | Q(**{name: value, 'pk__gt': pk})
+
+    def _encode(self, row, previous):
+        if isinstance(row, dict):
+            value, pk = row[self.sort] if self.sort else None, row['pk']
+        else:
+            value, pk = getattr(row, self.sort_attname) if self.sort else None, row.pk
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        return signing.dumps(
+            {'sort': self._sort_key(), 'value': value, 'pk': pk, 'previous': previous}, salt=self.salt
+        )
+
+    def _decode(self, token):
+        if not token:
+            return None
+        try:
+            cursor = signing.loads(token, salt=self.salt)
+        except signing.BadSignature:
+            return None
+        # A token from another sort order points at nothing meaningful here
+        if not isinstance(cursor, dict) or cursor.get('sort') != self._sort_key():
+            return None
+        return cursor
+
+    def _sort_key(self):
+        return f"{'-' if self.descending else ''}{self.sort or 'pk'}"
+
+
+class KeysetPaginationMixin:
+    """
+    Page a ListView with KeysetPaginator. Templates get page_obj.next_query and
+    page_obj.previous_query, the current query string pointing at the neighbouring page.
+    """
+    cursor_param = 'cursor'
+    count_mode = None
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset, page_size,
+            count_mode=self.count_mode or getattr(settings, 'LIST_COUNT_MODE', 'exact'),
+            count_limit=getattr(settings, 'LIST_COUNT_LIMIT', 1000),
+        )
+        page = paginator.page(self.request.GET.get(self.cursor_param))
+        page.next_query = self._cursor_query(page.next_token)
+        page.previous_query = self._cursor_query(page.previous_token)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def _cursor_query(self, token):
+        if token is None:
+            return None
+        params = self.request.GET.copy()
+        params[self.cursor_param] = token
+        return params.urlencode()
@@ -0,0 +1,45 @@
+"""
+The hashing policy for System_User passwords, separate from the one Django's own users follow.
+
+settings.SYSTEM_USER_PASSWORD_HASHER names the algorithm of one of settings.PASSWORD_HASHERS
+('pbkdf2_sha256', 'argon2', 'bcrypt_sha256', ...) and SYSTEM_USER_HASHER_PARAMS overrides its
+work factor: 'iterations' for PBKDF2, 'time_cost', 'memory_cost' and 'parallelism' for Argon2,
+'rounds' for bcrypt. Hashes made under another policy are upgraded the next time their user logs in.
+"""
+import copy
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+
+
+def system_user_hasher(algorithm=None, params=None):
+    """Return a hasher for the configured (or the given) algorithm with its work factor applied."""
+    hasher = get_hasher(algorithm or getattr(settings, 'SYSTEM_USER_PASSWORD_HASHER', 'default'))
+    params = getattr(settings, 'SYSTEM_USER_HASHER_PARAMS', {}) if params is None else params
+    if params:
+        # get_hasher() returns a shared instance; tune a copy of it
+        hasher = copy.copy(hasher)
+        for name, value in params.items():
+            if not hasattr(hasher, name):
+                raise ValueError(f"The {hasher.algorithm} hasher has no '{name}' parameter.")
+            setattr(hasher, name, value)
+    return hasher
+
+
+def hash_cost(hasher, repeat=5):
+    """Median milliseconds the hasher takes to check one password."""
+    encoded = hasher.encode('benchmark-password', hasher.salt())
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher.verify('benchmark-password', encoded)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def calibrate_pbkdf2_iterations(target_ms, algorithm='pbkdf2_sha256'):
+    """The PBKDF2 iteration count whose check takes about target_ms on this machine."""
+    probe = system_user_hasher(algorithm, {'iterations': 100000})
+    per_iteration = hash_cost(probe) / probe.iterations
+    return int(max(1000, round(target_ms / per_iteration, -3)))
@@ -0,0 +1,41 @@
+"""
+Cached reference data: the courses, years of study, academic years and semesters offered as
+form choices and listed on dashboards. They change a few times a year, so each table is read
+once and kept for settings.REFERENCE_CACHE_TTL seconds, under the 'reference' version of
+tracker.versions that tracker.signals bumps whenever one of their rows is saved or deleted.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Program, Course, YearOfStudy, AcademicYear, Semester
+from .versions import versioned_key
+
+# model: relations loaded with its rows, so their labels and templates run no further query
+REFERENCE_MODELS = {
+    Course: ['program'],
+    YearOfStudy: [],
+    AcademicYear: [],
+    Semester: ['academic_year'],
+}
+
+# Models whose changes show up in the cached rows
+INVALIDATING_MODELS = [Program, *REFERENCE_MODELS]
+
+
+def reference_rows(model):
+    """Return the rows of a REFERENCE_MODELS model keyed by str(pk), in primary key order."""
+    ttl = getattr(settings, 'REFERENCE_CACHE_TTL', 0)
+    if ttl:
+        key = versioned_key('reference', model._meta.label_lower)
+        rows = cache.get(key)
+        if rows is not None:
+            return rows
+
+    rows = {str(row.pk): row for row in model.objects.select_related(*REFERENCE_MODELS[model]).order_by('pk')}
+    if ttl:
+        cache.set(key, rows, ttl)
+    return rows
+
+
+def reference_choices(model, empty_label='---------'):
+    return [('', empty_label), *((pk, str(row)) for pk, row in reference_rows(model).items())]
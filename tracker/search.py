@@ -0,0 +1,160 @@
+"""
+Full-text search over results, nominal rolls and complaints.
+
+On SQLite each model has an FTS5 shadow table (created by migrations 0009_search_index and
+0017_complaint_search_rowid) holding the student's reg no and name, the unit code and name, and
+the academic year, keyed by rowid so that its rows are found without scanning the index: for
+results and nominal rolls the rowid is their integer primary key; complaints have a varchar
+primary key, so tracker_complaint_search_key gives each complaint_code a search_rowid. The
+signals in tracker.signals keep it in sync with single-row updates; rebuild_search_index refills
+it after bulk changes. Other databases fall back to icontains filters.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Student, Unit, AcademicYear, UnitOffering, Result, NominalRoll, Complaint
+
+SEARCH_COLUMNS = ['reg_no', 'reg_no_parts', 'student_name', 'unit_code', 'unit_name', 'academic_year']
+
+_MARKS_SOURCE = """
+    SELECT t.id, s.reg_no, replace(replace(s.reg_no, '/', ' '), '-', ' '),
+           s.first_name || ' ' || s.last_name, u.unit_code, u.unit_name, y.academic_year
+    FROM {table} t
+    JOIN tracker_student s ON s.reg_no = t.reg_no_id
+    JOIN tracker_unit u ON u.unit_code = t.unit_code_id
+    JOIN tracker_academicyear y ON y.year_id = t.academic_year_id
+"""
+
+_COMPLAINT_SOURCE = """
+    SELECT k.search_rowid, s.reg_no, replace(replace(s.reg_no, '/', ' '), '-', ' '),
+           s.first_name || ' ' || s.last_name, u.unit_code, u.unit_name, y.academic_year
+    FROM tracker_complaint t
+    JOIN tracker_complaint_search_key k ON k.complaint_code = t.complaint_code
+    JOIN tracker_student s ON s.reg_no = t.student_id
+    JOIN tracker_unitoffering o ON o.offering_id = t.unit_offering_id
+    JOIN tracker_unit u ON u.unit_code = o.unit_id
+    JOIN tracker_academicyear y ON y.year_id = o.academic_year_id
+"""
+
+# model: (FTS table, table mapping a non-integer primary key to its search_rowid or None, SELECT
+# producing the rowid + SEARCH_COLUMNS, icontains fallback lookups)
+SEARCH_INDEXES = {
+    Result: (
+        'tracker_result_search', None, _MARKS_SOURCE.format(table='tracker_result'),
+        ['reg_no__reg_no', 'reg_no__first_name', 'reg_no__last_name', 'unit_code__unit_code',
+         'unit_code__unit_name', 'academic_year__academic_year'],
+    ),
+    NominalRoll: (
+        'tracker_nominalroll_search', None, _MARKS_SOURCE.format(table='tracker_nominalroll'),
+        ['reg_no__reg_no', 'reg_no__first_name', 'reg_no__last_name', 'unit_code__unit_code',
+         'unit_code__unit_name', 'academic_year__academic_year'],
+    ),
+    Complaint: (
+        'tracker_complaint_search', 'tracker_complaint_search_key', _COMPLAINT_SOURCE,
+        ['student__reg_no', 'student__first_name', 'student__last_name', 'unit_offering__unit__unit_code',
+         'unit_offering__unit__unit_name', 'unit_offering__academic_year__academic_year'],
+    ),
+}
+
+# Rows to re-index when a related object changes: related model -> {model: WHERE clause on t}
+DEPENDENT_ROWS = {
+    Student: {
+        Result: 't.reg_no_id = %s', NominalRoll: 't.reg_no_id = %s', Complaint: 't.student_id = %s',
+    },
+    Unit: {
+        Result: 't.unit_code_id = %s', NominalRoll: 't.unit_code_id = %s',
+        Complaint: 't.unit_offering_id IN (SELECT offering_id FROM tracker_unitoffering WHERE unit_id = %s)',
+    },
+    AcademicYear: {
+        Result: 't.academic_year_id = %s', NominalRoll: 't.academic_year_id = %s',
+        Complaint: 't.unit_offering_id IN (SELECT offering_id FROM tracker_unitoffering WHERE academic_year_id = %s)',
+    },
+    UnitOffering: {
+        Complaint: 't.unit_offering_id = %s',
+    },
+}
+
+
+def search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def reindex(model, where=None, params=(), created=False):
+    """
+    Replace the search rows of the model's rows matching where (a clause on alias t), or of every
+    row. Pass created=True for rows just inserted, which have no search rows to replace yet.
+    """
+    if not search_enabled():
+        return
+    table, key_table, source, fallback = SEARCH_INDEXES[model]
+    insert = f"INSERT INTO {table} (rowid, {', '.join(SEARCH_COLUMNS)}) {source}"
+    with connection.cursor() as cursor:
+        if where is None:
+            cursor.execute(f"DELETE FROM {table}")
+            if key_table:
+                cursor.execute(f"DELETE FROM {key_table}")
+                cursor.execute(f"INSERT INTO {key_table} (complaint_code) {_keys(model, 'TRUE')}")
+            cursor.execute(insert)
+            return
+        if not created:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({_rowids(model, where)})", params)
+        elif key_table:
+            cursor.execute(f"INSERT OR IGNORE INTO {key_table} (complaint_code) {_keys(model, where)}", params)
+        cursor.execute(f"{insert} WHERE {where}", params)
+
+
+def unindex(model, where, params=()):
+    """Drop the search rows of the model's rows matching where. Call before the rows are deleted."""
+    if not search_enabled():
+        return
+    table, key_table, source, fallback = SEARCH_INDEXES[model]
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({_rowids(model, where)})", params)
+        if key_table:
+            cursor.execute(f"DELETE FROM {key_table} WHERE complaint_code IN ({_keys(model, where)})", params)
+
+
+def _keys(model, where):
+    return f"SELECT t.{model._meta.pk.column} FROM {model._meta.db_table} t WHERE {where}"
+
+
+def _rowids(model, where):
+    """SELECT of the search rowids of the model's rows matching where."""
+    key_table = SEARCH_INDEXES[model][1]
+    if not key_table:
+        return _keys(model, where)
+    return (
+        f"SELECT k.search_rowid FROM {model._meta.db_table} t "
+        f"JOIN {key_table} k ON k.complaint_code = t.{model._meta.pk.column} WHERE {where}"
+    )
+
+
+def rebuild_search_index():
+    for model in SEARCH_INDEXES:
+        reindex(model)
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query matching rows that contain every word, each as a prefix."""
+    return ' '.join(f'"{token}"*' for token in re.findall(r'[\w/-]+', text.lower()))
+
+
+def search_filter(queryset, text):
+    """Filter a Result, NominalRoll or Complaint queryset to the rows matching text."""
+    table, key_table, source, fallback = SEARCH_INDEXES[queryset.model]
+    expression = match_expression(text)
+    if not expression:
+        return queryset
+    if not search_enabled():
+        query = Q()
+        for lookup in fallback:
+            query |= Q(**{f'{lookup}__icontains': text})
+        return queryset.filter(query)
+
+    matches = f"SELECT rowid FROM {table} WHERE {table} MATCH %s"
+    if key_table:
+        matches = f"SELECT complaint_code FROM {key_table} WHERE search_rowid IN ({matches})"
+    return queryset.filter(pk__in=RawSQL(matches, [expression]))
@@ -0,0 +1,115 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .reference import INVALIDATING_MODELS
+from .middleware import lecturer_cache_key
+from .models import Lecturer, Student, Complaint, Response, UnitOffering, Result, NominalRoll
+from .stats import counters_for, adjust_counters, refresh_lecturer_units
+from .search import DEPENDENT_ROWS, reindex, unindex
+from .versions import forget_cached
+
+
+@receiver(pre_save, sender=Lecturer)
+def remember_lecturer_username(sender, instance, raw=False, **kwargs):
+    # The cache is keyed by username, so a renamed lecturer's old entry has to go as well
+    if not instance._state.adding and not raw:
+        instance._previous_username = sender.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Lecturer)
+def forget_cached_lecturer(sender, instance, **kwargs):
+    cache.delete_many([
+        lecturer_cache_key(username)
+        for username in {instance.username, getattr(instance, '_previous_username', None)} if username
+    ])
+
+
+# Dashboard counters: each save moves the instance from the counters it used to count
+# towards to the ones it counts towards now.
+COUNTED_MODELS = [Student, Lecturer, Complaint, Response]
+
+
+def remember_counters(sender, instance, raw=False, **kwargs):
+    # A row being inserted has nothing to look up, even when its primary key is set in advance
+    adding = instance._state.adding or instance.pk is None
+    previous = sender.objects.filter(pk=instance.pk).first() if not adding and not raw else None
+    instance._previous_counters = counters_for(previous) if previous else set()
+
+
+def update_counters(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_counters', set())
+    current = counters_for(instance)
+    adjust_counters(current - previous, 1)
+    adjust_counters(previous - current, -1)
+
+
+def release_counters(sender, instance, **kwargs):
+    # Before the delete, while related rows needed to find the department still exist
+    adjust_counters(counters_for(instance), -1)
+
+
+for model in COUNTED_MODELS:
+    pre_save.connect(remember_counters, sender=model, dispatch_uid=f'remember_counters_{model.__name__}')
+    post_save.connect(update_counters, sender=model, dispatch_uid=f'update_counters_{model.__name__}')
+    pre_delete.connect(release_counters, sender=model, dispatch_uid=f'release_counters_{model.__name__}')
+
+
+def forget_cached_reference_data(sender, **kwargs):
+    forget_cached('reference')
+
+
+for model in INVALIDATING_MODELS:
+    post_save.connect(forget_cached_reference_data, sender=model, dispatch_uid=f'forget_reference_{model.__name__}')
+    post_delete.connect(forget_cached_reference_data, sender=model, dispatch_uid=f'forget_reference_{model.__name__}')
+
+
+@receiver([post_save, post_delete], sender=UnitOffering)
+def forget_cached_offerings(sender, **kwargs):
+    forget_cached('offerings')
+
+
+@receiver(pre_save, sender=UnitOffering)
+def remember_offering_lecturer(sender, instance, raw=False, **kwargs):
+    if instance.pk is not None and not raw:
+        instance._previous_lecturer_id = sender.objects.filter(pk=instance.pk).values_list('lecturer', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=UnitOffering)
+def refresh_offering_lecturers(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    refresh_lecturer_units(instance.lecturer_id)
+    previous = getattr(instance, '_previous_lecturer_id', None)
+    if previous != instance.lecturer_id:
+        refresh_lecturer_units(previous)
+
+
+# Full-text search: keep each indexed row's search entry in step with the row and the
+# student, unit and academic year it is described by.
+@receiver(post_save, sender=Result)
+@receiver(post_save, sender=NominalRoll)
+@receiver(post_save, sender=Complaint)
+def index_searchable(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        reindex(sender, f't.{sender._meta.pk.column} = %s', [instance.pk], created=created)
+
+
+@receiver(pre_delete, sender=Result)
+@receiver(pre_delete, sender=NominalRoll)
+@receiver(pre_delete, sender=Complaint)
+def unindex_searchable(sender, instance, **kwargs):
+    unindex(sender, f't.{sender._meta.pk.column} = %s', [instance.pk])
+
+
+def reindex_dependents(sender, instance, created=False, raw=False, **kwargs):
+    if created or raw:
+        return
+    for model, where in DEPENDENT_ROWS[sender].items():
+        reindex(model, where, [instance.pk])
+
+
+for model in DEPENDENT_ROWS:
+    post_save.connect(reindex_dependents, sender=model, dispatch_uid=f'reindex_dependents_{model.__name__}')
@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Subquery
+
+from .models import (
+    Department, Student, Lecturer, Course, Unit, UnitOffering, Complaint, Response,
+    DepartmentStats, LecturerStats
+)
+
+DEPARTMENT_COUNTERS = [
+    'total_students', 'total_lecturers_in_department', 'department_complaints_count', 'pending_responses_count',
+]
+LECTURER_COUNTERS = ['total_units_for_lecturer', 'assigned_complaints_count']
+
+
+class SubqueryCount(Subquery):
+    """COUNT(*) of a queryset, usable as an annotation."""
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _count)'
+    output_field = IntegerField()
+
+
+def compute_dashboard_stats(lecturer):
+    """
+    Compute every dashboard counter for a lecturer and their department in one query.
+
+    Returns a dict with the DEPARTMENT_COUNTERS and LECTURER_COUNTERS.
+    """
+    department = lecturer.department_id
+    return Department.objects.filter(pk=department).annotate(
+        total_students=SubqueryCount(
+            Student.objects.filter(course__program__department=department).values('pk')
+        ),
+        total_lecturers_in_department=SubqueryCount(
+            Lecturer.objects.filter(department=department).values('pk')
+        ),
+        total_units_for_lecturer=SubqueryCount(
+            UnitOffering.objects.filter(lecturer=lecturer).values('unit').distinct()
+        ),
+        department_complaints_count=SubqueryCount(
+            Complaint.objects.filter(unit_offering__unit__department=department).values('pk')
+        ),
+        assigned_complaints_count=SubqueryCount(
+            Complaint.objects.filter(assigned_lecturer=lecturer).values('pk')
+        ),
+        pending_responses_count=SubqueryCount(
+            Response.objects.filter(unit_offering__unit__department=department, approved_by_cod=False).values('pk')
+        ),
+    ).values(*DEPARTMENT_COUNTERS, *LECTURER_COUNTERS).get()
+
+
+def dashboard_stats(lecturer):
+    """
+    Read the stored dashboard counters for a lecturer and their department in one query,
+    computing and storing them first if either row does not exist yet.
+    """
+    stats = LecturerStats.objects.filter(lecturer=lecturer).values(
+        *LECTURER_COUNTERS,
+        **{name: F(f'lecturer__department__stats__{name}') for name in DEPARTMENT_COUNTERS},
+    ).first()
+    if stats is None or stats['total_students'] is None:
+        stats = compute_dashboard_stats(lecturer)
+        DepartmentStats.objects.update_or_create(
+            department_id=lecturer.department_id,
+            defaults={name: stats[name] for name in DEPARTMENT_COUNTERS},
+        )
+        LecturerStats.objects.update_or_create(
+            lecturer=lecturer,
+            defaults={name: stats[name] for name in LECTURER_COUNTERS},
+        )
+    return stats
+
+
+def rebuild_dashboard_stats():
+    """Recompute the counters of every department and lecturer with one grouped query per counter."""
+    def grouped(queryset, field):
+        return dict(queryset.values_list(field).annotate(count=Count('pk', distinct=True)).order_by())
+
+    department_counts = {
+        'total_students': grouped(Student.objects.all(), 'course__program__department'),
+        'total_lecturers_in_department': grouped(Lecturer.objects.all(), 'department'),
+        'department_complaints_count': grouped(Complaint.objects.all(), 'unit_offering__unit__department'),
+        'pending_responses_count': grouped(
+            Response.objects.filter(approved_by_cod=False), 'unit_offering__unit__department'
+        ),
+    }
+    lecturer_counts = {
+        'total_units_for_lecturer': dict(
+            UnitOffering.objects.filter(lecturer__isnull=False).values_list('lecturer')
+            .annotate(count=Count('unit', distinct=True)).order_by()
+        ),
+        'assigned_complaints_count': grouped(Complaint.objects.filter(assigned_lecturer__isnull=False), 'assigned_lecturer'),
+    }
+
+    with transaction.atomic():
+        DepartmentStats.objects.all().delete()
+        DepartmentStats.objects.bulk_create([
+            DepartmentStats(department_id=pk, **{name: counts.get(pk, 0) for name, counts in department_counts.items()})
+            for pk in Department.objects.values_list('pk', flat=True)
+        ])
+        LecturerStats.objects.all().delete()
+        LecturerStats.objects.bulk_create([
+            LecturerStats(lecturer_id=pk, **{name: counts.get(pk, 0) for name, counts in lecturer_counts.items()})
+            for pk in Lecturer.objects.values_list('pk', flat=True)
+        ])
+
+
+def counters_for(instance):
+    """
+    Return the set of (stats model, pk, counter) that a Student, Lecturer, Complaint
+    or Response currently counts towards.
+    """
+    if isinstance(instance, Student):
+        department = Course.objects.filter(pk=instance.course_id).values_list('program__department', flat=True).first()
+        return {(DepartmentStats, department, 'total_students')}
+    if isinstance(instance, Lecturer):
+        return {(DepartmentStats, instance.department_id, 'total_lecturers_in_department')}
+    if isinstance(instance, Complaint):
+        counters = {(DepartmentStats, _offering_department(instance.unit_offering_id), 'department_complaints_count')}
+        if instance.assigned_lecturer_id:
+            counters.add((LecturerStats, instance.assigned_lecturer_id, 'assigned_complaints_count'))
+        return counters
+    if isinstance(instance, Response) and not instance.approved_by_cod:
+        return {(DepartmentStats, _offering_department(instance.unit_offering_id), 'pending_responses_count')}
+    return set()
+
+
+def _offering_department(offering_id):
+    return UnitOffering.objects.filter(pk=offering_id).values_list('unit__department', flat=True).first()
+
+
+def adjust_counters(counters, delta):
+    """Add delta to each counter. Rows that do not exist yet are computed in full when first read."""
+    for model, pk, name in counters:
+        if pk is not None:
+            model.objects.filter(pk=pk).update(**{name: F(name) + delta})
+
+
+def refresh_lecturer_units(lecturer_id):
+    """Recount the distinct units of a lecturer, which cannot be adjusted by one."""
+    if lecturer_id is None:
+        return
+    LecturerStats.objects.filter(pk=lecturer_id).update(
+        total_units_for_lecturer=Unit.objects.filter(unitoffering__lecturer=lecturer_id).distinct().count()
+    )
@@ -1,3 +1,939 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from tempfile import TemporaryDirectory
+from functools import partial
+from io import StringIO
+from types import SimpleNamespace
+from smtplib import SMTPException
+from unittest.mock import patch
 
-# Create your tests here.
+import pandas as pd
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from .budgets import URL_BUDGETS, budget_label, make_fixtures, measure, unbudgeted_urls
+from .checks import check_lecturer_cache
+from .jobs import ABANDONED_ERROR
+from .middleware import get_lecturer
+from .models import (
+    School, Department, Program, Course, AcademicYear, Semester, YearOfStudy, Unit, Lecturer, Student,
+    UnitOffering, Complaint, Response, Result, NominalRoll, System_User, OutboxMessage, UploadJob,
+    Upload, UploadRow, DepartmentStats, LecturerStats
+)
+from .outbox import queue_mail, send_due_mail
+from .pagination import KeysetPaginator
+from .search import search_filter
+from .forms import StudentForm
+from .stats import compute_dashboard_stats, dashboard_stats, rebuild_dashboard_stats
+from .uploads import UPLOAD_FORMATS, process_upload, promote_upload, start_upload, validate_nominal_roll
+from .views import ResultListView, NominalRollListView
+from . import outbox, utils
+
+
+class TrackerTestData:
+    """A school with two departments, each with a unit offering, students and a COD."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = School.objects.create(school_code='SCI', school_name='Science')
+        cls.departments = [
+            Department.objects.create(department_code=f'D{n}', department_name=f'Department {n}', school=cls.school)
+            for n in range(2)
+        ]
+        cls.year = AcademicYear.objects.create(academic_year='2023/2024')
+        cls.semester = Semester.objects.create(semester_number=1, academic_year=cls.year)
+        cls.year_of_study = YearOfStudy.objects.create(study_year=1)
+        cls.offerings = []
+        for n, department in enumerate(cls.departments):
+            program = Program.objects.create(
+                program_code=f'P{n}', program_name=f'Program {n}', level='Degree', department=department
+            )
+            course = Course.objects.create(course_code=f'C{n}', course_name=f'Course {n}', program=program)
+            unit = Unit.objects.create(unit_code=f'U{n}', unit_name=f'Unit {n}', department=department)
+            cls.offerings.append(UnitOffering.objects.create(
+                unit=unit, course=course, academic_year=cls.year, semester=cls.semester,
+                year_of_study=cls.year_of_study
+            ))
+        cls.cod = cls.make_lecturer('COD', cls.departments[0])
+        cls.exam_officer = cls.make_lecturer('Exam Officer', cls.departments[0])
+        cls.student_count = 0
+
+    @classmethod
+    def make_lecturer(cls, role, department):
+        employee_no = f'E{Lecturer.objects.count()}'
+        return Lecturer.objects.create(
+            employee_no=employee_no, email_address=f'{employee_no}@mmust.ac.ke', username=f'{employee_no}@mmust.ac.ke',
+            first_name='Test', last_name='Lecturer', phone_number='0712345678', department=department, role=role
+        )
+
+    @classmethod
+    def make_student(cls):
+        cls.student_count += 1
+        offering = cls.offerings[0]
+        return Student.objects.create(
+            reg_no=f'SIT/B/01-{cls.student_count:05d}/2023', username=f'student{cls.student_count}',
+            first_name='Test', last_name='Student', email_address='student@mmust.ac.ke', phone_number='0712345678',
+            program=offering.course.program, course=offering.course
+        )
+
+    def make_responses(self, count, offering, approved=False):
+        for _ in range(count):
+            Response.objects.create(
+                student=self.make_student(), unit_offering=offering, academic_year=self.year,
+                cat_mark=20, exam_mark=40, approved_by_cod=approved
+            )
+
+    def log_in(self, lecturer):
+        session = self.client.session
+        session['username'] = lecturer.username
+        session.save()
+
+    def count_queries(self, url):
+        # Start from an empty cache so the logged-in lecturer's lookup is always counted
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+
+class ResponseListQueryTests(TrackerTestData, TestCase):
+    # session, lecturer, count and page
+    COD_RESPONSES_BUDGET = 4
+    # session, lecturer, departments and the responses of every department
+    APPROVED_RESPONSES_BUDGET = 4
+
+    def test_cod_responses_page_stays_within_budget(self):
+        self.log_in(self.cod)
+        self.make_responses(3, self.offerings[0])
+        few = self.count_queries(reverse('cod-responses-list'))
+
+        self.make_responses(40, self.offerings[0])
+        many = self.count_queries(reverse('cod-responses-list'))
+        last_page = self.count_queries(reverse('cod-responses-list') + '?page=3')
+
+        self.assertLessEqual(many, self.COD_RESPONSES_BUDGET)
+        self.assertEqual(few, many)
+        self.assertEqual(many, last_page)
+
+    def test_cod_responses_are_paginated(self):
+        self.log_in(self.cod)
+        self.make_responses(25, self.offerings[0])
+        self.make_responses(5, self.offerings[1])
+
+        response = self.client.get(reverse('cod-responses-list'))
+        self.assertEqual(len(response.context['responses']), 20)
+        self.assertEqual(response.context['page_obj'].paginator.count, 25)
+
+    def test_approved_responses_page_stays_within_budget(self):
+        self.log_in(self.exam_officer)
+        self.make_responses(2, self.offerings[0], approved=True)
+        self.make_responses(2, self.offerings[1], approved=True)
+        few = self.count_queries(reverse('approved-responses'))
+
+        self.make_responses(20, self.offerings[0], approved=True)
+        self.make_responses(20, self.offerings[1], approved=True)
+        many = self.count_queries(reverse('approved-responses'))
+
+        self.assertLessEqual(many, self.APPROVED_RESPONSES_BUDGET)
+        self.assertEqual(few, many)
+
+    def test_approved_responses_query_count_does_not_grow_with_departments(self):
+        self.log_in(self.exam_officer)
+        self.make_responses(2, self.offerings[0], approved=True)
+        before = self.count_queries(reverse('approved-responses'))
+
+        for n in range(2, 6):
+            Department.objects.create(department_code=f'D{n}', department_name=f'Department {n}', school=self.school)
+        self.assertEqual(self.count_queries(reverse('approved-responses')), before)
+
+    def test_approved_responses_are_paginated_per_department(self):
+        self.log_in(self.exam_officer)
+        self.make_responses(45, self.offerings[0], approved=True)
+        self.make_responses(3, self.offerings[1], approved=True)
+        self.make_responses(4, self.offerings[1])
+
+        response = self.client.get(reverse('approved-responses') + '?page_D0=3')
+        first, second = response.context['department_groups']
+        self.assertEqual((first['number'], first['num_pages'], len(first['responses'])), (3, 3, 5))
+        self.assertIsNone(first['next_query'])
+        self.assertIn('page_D0=2', first['previous_query'])
+        self.assertEqual((second['number'], second['num_pages'], len(second['responses'])), (1, 1, 3))
+
+        newest = Response.objects.filter(unit_offering=self.offerings[0]).order_by('-response_date', '-pk')
+        self.assertEqual([r.pk for r in first['responses']], [r.pk for r in newest[40:]])
+
+
+class ListPaginationTests(TrackerTestData, TestCase):
+    """Result and nominal roll lists page forward and back through every row under every sort."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.member = cls.make_lecturer('Member', cls.departments[0])
+        offering = cls.offerings[0]
+        years = [cls.year, AcademicYear.objects.create(academic_year='2024/2025')]
+        for year in years:
+            UnitOffering.objects.create(
+                unit=offering.unit, course=offering.course, academic_year=year, semester=cls.semester,
+                year_of_study=cls.year_of_study, lecturer=cls.member
+            )
+        # Few distinct marks and years, so most sort values are shared and the pk decides
+        for n in range(45):
+            student = cls.make_student()
+            year = years[n % 3 == 0]
+            Result.objects.create(
+                unit_code=offering.unit, reg_no=student, academic_year=year, cat=n % 4 + 1, exam=n % 5 * 10 + 10
+            )
+            NominalRoll.objects.create(unit_code=offering.unit, reg_no=student, academic_year=year)
+
+    def setUp(self):
+        self.log_in(self.member)
+
+    def walk(self, url, direction):
+        """Follow direction ('next' or 'previous') links from url; return the pages' rows."""
+        pages = []
+        response = self.client.get(url)
+        for _ in range(10):
+            page = response.context['page_obj']
+            pages.append(list(page))
+            query = page.next_query if direction == 'next' else page.previous_query
+            if query is None:
+                return pages, response.request['QUERY_STRING']
+            response = self.client.get(f'{url.split("?")[0]}?{query}')
+        self.fail(f'{url} never reached its last page')
+
+    def test_every_sort_pages_forward_and_back(self):
+        for view, url_name, total in [
+            (ResultListView, 'result', 45), (NominalRollListView, 'nominal-roll', 45)
+        ]:
+            for field in view.sort_fields:
+                for sort in [field, f'-{field}']:
+                    with self.subTest(url_name, sort=sort):
+                        forward, last_query = self.walk(f'{reverse(url_name)}?sort={sort}', 'next')
+                        rows = [row for page in forward for row in page]
+                        self.assertEqual(len(rows), total)
+                        self.assertEqual(len({row['pk'] for row in rows}), total)
+                        values = [row[field] for row in rows]
+                        self.assertEqual(values, sorted(values, reverse=sort.startswith('-')))
+
+                        backward, _ = self.walk(f'{reverse(url_name)}?{last_query}', 'previous')
+                        self.assertEqual(backward, forward[::-1])
+
+    def test_codes_match_anywhere_in_them(self):
+        for url_name in ['result', 'nominal-roll']:
+            with self.subTest(url_name):
+                pages, _ = self.walk(f'{reverse(url_name)}?reg_no=00012', 'next')
+                self.assertEqual([row['reg_no'] for page in pages for row in page], ['SIT/B/01-00012/2023'])
+                pages, _ = self.walk(f'{reverse(url_name)}?unit_code=0', 'next')
+                self.assertEqual(sum(len(page) for page in pages), 45)
+
+
+@override_settings(LECTURER_CACHE_TTL=60)
+class LecturerCacheTests(TrackerTestData, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def lookup(self, username):
+        return get_lecturer(SimpleNamespace(session={'username': username}))
+
+    def test_caching_requires_a_shared_cache(self):
+        self.assertEqual([error.id for error in check_lecturer_cache(None)], ['tracker.E001'])
+        with override_settings(LECTURER_CACHE_TTL=0):
+            self.assertEqual(check_lecturer_cache(None), [])
+
+    def test_a_changed_role_or_username_is_not_served_from_the_cache(self):
+        old_username = self.cod.username
+        self.assertEqual(self.lookup(old_username).role, 'COD')
+
+        self.cod.role = 'Member'
+        self.cod.username = 'renamed@mmust.ac.ke'
+        self.cod.save()
+        self.assertIsNone(self.lookup(old_username))
+        self.assertEqual(self.lookup('renamed@mmust.ac.ke').role, 'Member')
+
+
+@override_settings(JOB_LEASE_TIMEOUT=60)
+class UploadJobLeaseTests(TrackerTestData, TestCase):
+    def setUp(self):
+        self.member = self.make_lecturer('Member', self.departments[0])
+        self.log_in(self.member)
+
+    def make_job(self, heartbeat_age, upload=None):
+        return UploadJob.objects.create(
+            action='validate', upload=upload, lecturer=self.member, status='running',
+            heartbeat_at=timezone.now() - timedelta(seconds=heartbeat_age)
+        )
+
+    def status(self, job):
+        return self.client.get(reverse('upload-job-status', args=[job.job_id])).json()['status']
+
+    def test_status_reports_a_job_whose_worker_died_as_failed(self):
+        alive, dead = self.make_job(10), self.make_job(120)
+        self.assertEqual(self.status(alive), 'running')
+        self.assertEqual(self.status(dead), 'failed')
+        dead.refresh_from_db()
+        self.assertEqual(dead.error, ABANDONED_ERROR)
+
+    def test_run_jobs_fails_abandoned_jobs(self):
+        alive, dead = self.make_job(10), self.make_job(120)
+        call_command('run_jobs', '--once', stdout=StringIO())
+        alive.refresh_from_db()
+        dead.refresh_from_db()
+        self.assertEqual((alive.status, dead.status), ('running', 'failed'))
+
+    def test_the_upload_of_an_abandoned_validate_job_is_discarded(self):
+        alive, dead = self.make_job(10, start_upload('result')), self.make_job(120, start_upload('result'))
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertTrue(Upload.objects.filter(pk=alive.upload_id).exists())
+        self.assertFalse(Upload.objects.filter(pk=dead.upload_id).exists())
+
+
+class UploadViewTests(TrackerTestData, TestCase):
+    """Only an upload whose validate job went through the whole file can be submitted."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = [cls.make_student() for _ in range(4)]
+
+    def setUp(self):
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name, UPLOAD_CHUNK_SIZE=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.log_in(self.make_lecturer('Member', self.departments[0]))
+
+    def upload(self, lines):
+        lines = ['reg_no,unit_code,academic_year', *lines]
+        file = SimpleUploadedFile('roll.csv', '\n'.join(lines).encode())
+        self.client.post(reverse('load-nominal-roll'), {'file': file})
+
+    @override_settings(JOB_RUNNER='sync')
+    def test_a_file_that_fails_partway_leaves_nothing_to_submit(self):
+        rows = [f'{student.reg_no},U0,2023/2024' for student in self.students]
+        rows[3] += ',extra'
+        self.upload(rows)
+        self.assertFalse(Upload.objects.exists())
+
+        response = self.client.get(reverse('load-nominal-roll'))
+        self.assertNotIn('preview_data', response.context)
+        self.assertNotIn('nominal_roll_upload', self.client.session)
+        self.client.post(reverse('submit-nominal-roll'))
+        self.assertFalse(NominalRoll.objects.exists())
+        self.assertEqual(UploadJob.objects.get().status, 'failed')
+
+    @override_settings(JOB_RUNNER='process')
+    def test_an_upload_cannot_be_submitted_before_it_is_validated(self):
+        self.upload([f'{student.reg_no},U0,2023/2024' for student in self.students])
+        self.client.post(reverse('submit-nominal-roll'))
+        self.assertFalse(UploadJob.objects.filter(action='commit').exists())
+
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.client.post(reverse('submit-nominal-roll'))
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(NominalRoll.objects.count(), 4)
+
+
+class SearchIndexTests(TrackerTestData, TestCase):
+    """The FTS5 search tables follow saves and deletes of their rows and of the rows describing them."""
+
+    def search(self, model, text):
+        return list(search_filter(model.objects.order_by('pk'), text))
+
+    def test_rows_follow_saves_and_deletes(self):
+        student = self.make_student()
+        result = Result.objects.create(
+            unit_code=self.offerings[0].unit, reg_no=student, academic_year=self.year, cat=20, exam=40
+        )
+        complaint = Complaint.objects.create(
+            complaint_code='ABC123', student=student, unit_offering=self.offerings[0], missing_type='CAT'
+        )
+        self.assertEqual(self.search(Result, student.reg_no), [result])
+        self.assertEqual(self.search(Complaint, 'Test Student'), [complaint])
+
+        # The student's name is indexed with each of their rows
+        student.last_name = 'Wanjiru'
+        student.save()
+        self.assertEqual(self.search(Result, 'wanj'), [result])
+        self.assertEqual(self.search(Complaint, 'Wanjiru'), [complaint])
+        self.assertEqual(self.search(Complaint, 'Test Student'), [])
+
+        result.delete()
+        complaint.delete()
+        self.assertEqual(self.search(Result, student.reg_no), [])
+        self.assertEqual(self.search(Complaint, 'Wanjiru'), [])
+
+    def test_complaints_are_found_when_their_rowids_change(self):
+        complaints = [
+            Complaint.objects.create(
+                complaint_code=f'KEY{n:03d}', student=self.make_student(), unit_offering=self.offerings[0],
+                missing_type='CAT'
+            )
+            for n in range(3)
+        ]
+        # SQLite may renumber the implicit rowids of a table without an integer primary key,
+        # e.g. on VACUUM
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE tracker_complaint SET rowid = rowid + 100')
+        for complaint in complaints:
+            self.assertEqual(self.search(Complaint, complaint.student_id), [complaint])
+
+    def test_new_complaints_get_a_search_rowid(self):
+        student = self.make_student()
+        with CaptureQueriesContext(connection) as queries:
+            complaint = Complaint.objects.create(
+                complaint_code='ROW001', student=student, unit_offering=self.offerings[0], missing_type='CAT'
+            )
+        # A new row has no search row to delete first
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('DELETE')])
+        self.assertEqual(self.search(Complaint, student.reg_no), [complaint])
+
+        complaint.delete()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM tracker_complaint_search_key")
+            self.assertEqual(cursor.fetchone(), (0,))
+
+
+class NominalRollValidationTests(TrackerTestData, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = [cls.make_student() for _ in range(3)]
+        NominalRoll.objects.create(unit_code=cls.offerings[0].unit, reg_no=cls.students[1], academic_year=cls.year)
+        # A student of another school, whom this school's lecturers may not upload
+        school = School.objects.create(school_code='ART', school_name='Arts')
+        department = Department.objects.create(department_code='D9', department_name='Department 9', school=school)
+        program = Program.objects.create(program_code='P9', program_name='Program 9', level='Degree', department=department)
+        course = Course.objects.create(course_code='C9', course_name='Course 9', program=program)
+        cls.outsider = Student.objects.create(
+            reg_no='ART/B/01-00001/2023', username='outsider', first_name='Other', last_name='Student',
+            email_address='other@mmust.ac.ke', phone_number='0712345678', program=program, course=course
+        )
+
+    def sheet(self, rows):
+        return pd.DataFrame(rows, columns=['reg_no', 'unit_code', 'academic_year'])
+
+    def validate(self, rows, seen=None):
+        return validate_nominal_roll(self.sheet(rows), school=self.school.pk, seen=seen)
+
+    def test_each_row_is_accepted_or_rejected_with_its_first_failing_check(self):
+        first, saved, third = (student.reg_no for student in self.students)
+        accepted, rejected = self.validate([
+            [first, 'U0', '2023/2024'],
+            ['', 'U0', '2023/2024'],
+            ['not-a-reg-no', 'U0', '2023/2024'],
+            [self.outsider.reg_no, 'U0', '2023/2024'],
+            [third, 'NOPE', '2023/2024'],
+            [third, 'U0', '1999/2000'],
+            [saved, 'U0', '2023/2024'],
+            [first, 'U0', '2023/2024'],
+        ])
+        self.assertEqual(accepted, [
+            {'row': 2, 'reg_no_id': first, 'unit_code_id': 'U0', 'academic_year_id': self.year.pk},
+        ])
+        self.assertEqual([(row['row'], row['reason']) for row in rejected], [
+            (3, 'reg_no is empty.'),
+            (4, 'Invalid registration number format.'),
+            (5, 'Student not found in your school.'),
+            (6, 'Unit not found.'),
+            (7, 'Academic year not found.'),
+            (8, 'Already in the nominal roll.'),
+            (9, 'Duplicate row in file.'),
+        ])
+
+    def test_query_count_does_not_grow_with_the_sheet(self):
+        # One lookup each for students, units and academic years, and one for saved rows
+        with self.assertNumQueries(4):
+            self.validate([[self.students[0].reg_no, 'U0', '2023/2024']])
+        rows = [[f'SIT/B/01-{n:05d}/2023', 'U0', '2023/2024'] for n in range(500)]
+        with self.assertNumQueries(4):
+            accepted, rejected = self.validate(rows)
+        self.assertEqual(len(accepted), 2)
+
+    def test_duplicates_are_caught_across_batches(self):
+        seen = set()
+        row = [self.students[0].reg_no, 'U0', '2023/2024']
+        self.assertEqual(len(self.validate([row], seen)[0]), 1)
+        accepted, rejected = self.validate([row], seen)
+        self.assertEqual((accepted, [r['reason'] for r in rejected]), ([], ['Duplicate row in file.']))
+
+
+class UploadStagingTests(TrackerTestData, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.students = [cls.make_student() for _ in range(4)]
+
+    def stage(self, kind, lines, **kwargs):
+        """Validate a CSV through process_upload into a new Upload; return it and the rejected rows."""
+        columns, dtypes, validate = UPLOAD_FORMATS[kind]
+        upload = start_upload(kind)
+        file = SimpleUploadedFile('upload.csv', '\n'.join([','.join(columns), *lines]).encode())
+        rejected = process_upload(
+            file, columns, dtypes, partial(validate, school=self.school.pk), upload, **kwargs
+        )
+        return upload, rejected
+
+    def test_accepted_rows_are_staged_batch_by_batch(self):
+        progress = []
+        upload, rejected = self.stage(
+            'result', [f'{student.reg_no},U0,2023/2024,{20 + n},{40 + n}' for n, student in enumerate(self.students)]
+            + ['SIT/B/01-99999/2023,U0,2023/2024,20,40'],
+            chunk_size=2, on_batch=lambda processed, rejected: progress.append((processed, rejected)),
+        )
+        self.assertEqual(progress, [(2, 0), (4, 0), (5, 1)])
+        self.assertEqual([row['row'] for row in rejected], [6])
+        self.assertEqual(
+            list(upload.rows.order_by('row').values_list('row', 'reg_no', 'cat', 'exam')),
+            [(n + 2, student.reg_no, 20 + n, 40 + n) for n, student in enumerate(self.students)]
+        )
+        # Nothing reaches the results until the upload is submitted
+        self.assertFalse(Result.objects.exists())
+
+    def test_promotion_inserts_staged_rows_and_skips_keys_saved_meanwhile(self):
+        upload, rejected = self.stage('nominal_roll', [f'{student.reg_no},U0,2023/2024' for student in self.students])
+        NominalRoll.objects.create(unit_code=self.offerings[0].unit, reg_no=self.students[0], academic_year=self.year)
+
+        with CaptureQueriesContext(connection) as queries:
+            inserted, skipped = promote_upload(upload)
+        self.assertEqual((inserted, skipped), (3, 1))
+        # Every row goes in with one INSERT ... SELECT
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "tracker_nominalroll"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(NominalRoll.objects.count(), 4)
+        self.assertEqual(set(NominalRoll.objects.values_list('date', flat=True)), {date.today()})
+        self.assertFalse(Upload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(UploadRow.objects.exists())
+        # Raw inserts send no signals, so promotion indexes the rows itself
+        self.assertEqual(len(search_filter(NominalRoll.objects.all(), self.students[3].reg_no)), 1)
+
+    def test_promotion_copies_result_marks(self):
+        upload, rejected = self.stage('result', [f'{self.students[0].reg_no},U0,2023/2024,25,65'])
+        self.assertEqual(promote_upload(upload), (1, 0))
+        self.assertEqual(list(Result.objects.values_list('reg_no', 'cat', 'exam')), [(self.students[0].reg_no, 25, 65)])
+
+
+class DashboardCounterTests(TrackerTestData, TestCase):
+    """The stored dashboard counters follow every save and delete to what a full recount gives."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.members = [cls.make_lecturer('Member', department) for department in cls.departments]
+        rebuild_dashboard_stats()
+
+    def assertCountersCurrent(self):
+        for lecturer in Lecturer.objects.all():
+            with self.subTest(lecturer=lecturer.pk):
+                self.assertEqual(dashboard_stats(lecturer), compute_dashboard_stats(lecturer))
+
+    def test_counters_follow_saves_and_deletes(self):
+        first, second = self.members
+        student = self.make_student()
+        complaint = Complaint.objects.create(
+            complaint_code='CNT001', student=student, unit_offering=self.offerings[0], missing_type='CAT',
+            assigned_lecturer=first
+        )
+        response = Response.objects.create(
+            student=student, unit_offering=self.offerings[0], academic_year=self.year, cat_mark=20
+        )
+        self.assertCountersCurrent()
+        self.assertEqual(dashboard_stats(first)['assigned_complaints_count'], 1)
+
+        # Reassigned and moved to the other department's offering
+        complaint.assigned_lecturer = second
+        complaint.unit_offering = self.offerings[1]
+        complaint.save()
+        response.approved_by_cod = True
+        response.save()
+        self.assertCountersCurrent()
+
+        # A lecturer moves department; the other department gets an offering for the first lecturer
+        second.department = self.departments[0]
+        second.save()
+        self.offerings[1].lecturer = first
+        self.offerings[1].save()
+        self.assertCountersCurrent()
+        self.assertEqual(dashboard_stats(first)['total_units_for_lecturer'], 1)
+
+        complaint.delete()
+        response.delete()
+        student.delete()
+        self.assertCountersCurrent()
+
+    def test_missing_counters_are_computed_on_first_read(self):
+        LecturerStats.objects.all().delete()
+        DepartmentStats.objects.all().delete()
+        self.make_student()
+        self.assertEqual(dashboard_stats(self.cod)['total_students'], 1)
+        self.assertTrue(LecturerStats.objects.filter(pk=self.cod.pk).exists())
+        with self.assertNumQueries(1):
+            dashboard_stats(self.cod)
+
+
+class KeysetPaginatorTests(TrackerTestData, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        unit = cls.offerings[0].unit
+        # bulk_create skips Result.clean(), so some CAT marks can be missing
+        Result.objects.bulk_create([
+            Result(unit_code=unit, reg_no=cls.make_student(), academic_year=cls.year, cat=None if n % 4 == 0 else n % 3, exam=40)
+            for n in range(25)
+        ])
+
+    def walk(self, paginator):
+        """Page forward to the end and back to the start; return the pages seen each way."""
+        forward = [paginator.page()]
+        while forward[-1].has_next():
+            forward.append(paginator.page(forward[-1].next_token))
+        backward = [forward[-1]]
+        while backward[-1].has_previous():
+            backward.append(paginator.page(backward[-1].previous_token))
+        ids = lambda pages: [[row.pk for row in page] for page in pages]
+        return ids(forward), ids(backward)[::-1]
+
+    def test_pages_cover_every_row_once_in_both_directions(self):
+        for ordering in ['pk', '-pk', 'cat', '-cat']:
+            with self.subTest(ordering):
+                queryset = Result.objects.order_by(ordering)
+                forward, backward = self.walk(KeysetPaginator(queryset, 7))
+                self.assertEqual([len(page) for page in forward], [7, 7, 7, 4])
+                self.assertEqual(forward, backward)
+                # Missing marks sort first ascending and last descending; ties go by pk
+                field = ordering.lstrip('-')
+                key = lambda result: (getattr(result, field) is not None, getattr(result, field) or 0, result.pk)
+                expected = sorted(Result.objects.all(), key=key, reverse=ordering.startswith('-'))
+                self.assertEqual(sum(forward, []), [result.pk for result in expected])
+
+    def test_every_page_costs_one_query(self):
+        paginator = KeysetPaginator(Result.objects.order_by('cat'), 5)
+        page = paginator.page()
+        while page.has_next():
+            with self.assertNumQueries(1):
+                page = paginator.page(page.next_token)
+
+    def test_foreign_or_tampered_tokens_give_the_first_page(self):
+        by_cat = KeysetPaginator(Result.objects.order_by('cat'), 5)
+        by_pk = KeysetPaginator(Result.objects.order_by('pk'), 5)
+        token = by_cat.page().next_token
+        first = [row.pk for row in by_pk.page()]
+        self.assertEqual([row.pk for row in by_pk.page(token)], first)
+        self.assertEqual([row.pk for row in by_pk.page(token[:-2] + 'xx')], first)
+
+    def test_estimated_count_stops_at_the_limit(self):
+        paginator = KeysetPaginator(Result.objects.order_by('pk'), 5, count_mode='estimate', count_limit=10)
+        self.assertEqual((paginator.count, paginator.count_is_estimate), (10, True))
+        exact = KeysetPaginator(Result.objects.order_by('pk'), 5)
+        self.assertEqual((exact.count, exact.count_is_estimate), (25, False))
+
+
+class URLBudgetTests(TrackerTestData, TestCase):
+    """Every URL stays within its tracker.budgets query budget with a few dozen rows behind it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        offering = cls.offerings[0]
+        cls.member = cls.make_lecturer('Member', cls.departments[0])
+        offering.lecturer = cls.member
+        offering.save()
+
+        for n in range(30):
+            student = cls.make_student()
+            Complaint.objects.create(
+                complaint_code=f'T{n:04d}', student=student, unit_offering=offering, missing_type='CAT',
+                assigned_lecturer=cls.member if n % 2 else None
+            )
+            Response.objects.create(
+                student=student, unit_offering=offering, academic_year=cls.year, cat_mark=20,
+                approved_by_cod=bool(n % 2)
+            )
+            Result.objects.create(unit_code=offering.unit, reg_no=student, academic_year=cls.year, cat=20, exam=40)
+            NominalRoll.objects.create(unit_code=offering.unit, reg_no=student, academic_year=cls.year)
+        cls.fixtures = make_fixtures(cls.member, cls.exam_officer, cls.cod, offering, cls.make_student())
+        # Budgets are for stored counters; the first read of a missing row computes it in full
+        rebuild_dashboard_stats()
+
+    def test_every_url_has_a_budget(self):
+        self.assertEqual(unbudgeted_urls(), [])
+
+    def test_urls_stay_within_query_budgets(self):
+        for budget in URL_BUDGETS:
+            with self.subTest(budget_label(budget)):
+                result = measure(self.client, budget, self.fixtures)
+                self.assertEqual(result['status'], budget.status)
+                self.assertLessEqual(result['queries'], budget.queries)
+
+
+class ComplaintCodeTests(TrackerTestData, TestCase):
+    def setUp(self):
+        # Start every test without a block left over in this process
+        utils._blocks.clear()
+
+    def test_permutation_is_one_to_one_over_the_code_space(self):
+        indexes = [0, 1, 2, utils.CODE_SPACE - 1, *range(1000, 6000)]
+        permuted = [utils.permute(index) for index in indexes]
+        self.assertEqual(len(set(permuted)), len(indexes))
+        for index, value in zip(indexes, permuted):
+            self.assertTrue(0 <= value < utils.CODE_SPACE)
+            self.assertEqual(utils.permute(value, inverse=True), index)
+            self.assertEqual(utils.decode_code(utils.encode_code(value)), value)
+        self.assertEqual(utils.encode_code(utils.CODE_SPACE - 1), 'ZZZ999')
+
+    def test_processes_never_share_codes(self):
+        with self.settings(COMPLAINT_CODE_BLOCK_SIZE=10):
+            first = [utils.next_complaint_code() for _ in range(25)]
+            # Another process starts with no block of its own
+            utils._blocks.clear()
+            second = [utils.next_complaint_code() for _ in range(25)]
+            # Within a reserved block a code costs no query at all
+            with self.assertNumQueries(0):
+                utils.next_complaint_code()
+
+        self.assertEqual(len(set(first + second)), 50)
+        for code in first + second:
+            self.assertRegex(code, r'^[A-Z]{3}[0-9]{3}$')
+
+    def test_create_complaint_skips_a_code_issued_before_the_allocator(self):
+        student = self.make_student()
+        legacy = Complaint.objects.create(
+            complaint_code=utils.encode_code(utils.permute(0)), student=student, unit_offering=self.offerings[0],
+            missing_type='CAT'
+        )
+        complaint = utils.create_complaint(
+            student=self.make_student(), unit_offering=self.offerings[0], missing_type='EXAM'
+        )
+        self.assertNotEqual(complaint.complaint_code, legacy.complaint_code)
+        self.assertEqual(complaint.complaint_code, utils.encode_code(utils.permute(1)))
+
+
+class ComplaintIntakeTests(TrackerTestData, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = self.make_student()
+        offering = self.offerings[0]
+        session = self.client.session
+        session['student_data'] = {
+            'reg_no': self.student.reg_no, 'course': offering.course_id, 'year_of_study': 1,
+            'academic_year': self.year.academic_year, 'semester_id': self.semester.pk,
+        }
+        session.save()
+
+    def submit(self):
+        return self.client.post(
+            reverse('post-complaint'), {'unit': self.offerings[0].pk, 'missing_mark_type': ['CAT', 'EXAM']}
+        )
+
+    def test_a_student_complains_once_per_offering(self):
+        self.assertRedirects(self.submit(), reverse('student'), fetch_redirect_response=False)
+        response = self.submit()
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'You have already submitted a complaint for this unit.')
+
+        complaint = Complaint.objects.get(student=self.student)
+        self.assertEqual((complaint.unit_offering, complaint.missing_type), (self.offerings[0], 'BOTH'))
+
+    def test_offerings_are_read_once_and_forgotten_when_an_offering_changes(self):
+        self.client.get(reverse('post-complaint'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('post-complaint'))
+        self.assertFalse([q for q in queries.captured_queries if 'tracker_unitoffering' in q['sql']])
+
+        unit = Unit.objects.create(unit_code='U9', unit_name='Unit 9', department=self.departments[0])
+        UnitOffering.objects.create(
+            unit=unit, course=self.offerings[0].course, academic_year=self.year, semester=self.semester,
+            year_of_study=self.year_of_study
+        )
+        self.assertContains(self.client.get(reverse('post-complaint')), 'U9 - C0 - 2023/2024')
+
+    @override_settings(CACHE_VERSION_CHECK=0)
+    def test_an_offering_saved_by_another_worker_clears_this_cache(self):
+        self.client.get(reverse('post-complaint'))
+        # Another worker's save: the row and the version bump reach the database, not this cache
+        unit = Unit.objects.create(unit_code='U9', unit_name='Unit 9', department=self.departments[0])
+        UnitOffering.objects.bulk_create([UnitOffering(
+            unit=unit, course=self.offerings[0].course, academic_year=self.year, semester=self.semester,
+            year_of_study=self.year_of_study
+        )])
+        utils.reserve_block('cache:offerings', 1)
+        self.assertContains(self.client.get(reverse('post-complaint')), 'U9 - C0 - 2023/2024')
+
+    def test_submission_runs_no_lookups_before_the_insert(self):
+        self.client.get(reverse('post-complaint'))
+        with CaptureQueriesContext(connection) as queries:
+            self.submit()
+        tables = ['tracker_course', 'tracker_yearofstudy', 'tracker_academicyear', 'tracker_semester', 'tracker_student']
+        lookups = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in lookups if any(f'FROM "{table}"' in sql for table in tables)])
+
+
+class ReferenceDataTests(TrackerTestData, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_student_form_runs_no_queries_once_cached(self):
+        StudentForm().as_p()
+        data = {
+            'reg_no': 'SIT/B/01-00001/2023', 'course': 'C0', 'year_of_study': self.year_of_study.pk,
+            'academic_year': self.year.pk, 'semester': self.semester.pk,
+        }
+        with self.assertNumQueries(0):
+            html = StudentForm().as_p()
+            form = StudentForm(data)
+            self.assertTrue(form.is_valid())
+        self.assertIn('1 - 2023/2024', html)
+        self.assertEqual(form.cleaned_data['semester'], self.semester)
+        self.assertEqual(form.cleaned_data['semester'].academic_year, self.year)
+
+    def test_saving_a_reference_row_clears_the_cache(self):
+        self.assertFalse(StudentForm({'academic_year': 'missing'}).is_valid())
+        year = AcademicYear.objects.create(academic_year='2024/2025')
+        form = StudentForm({'academic_year': year.pk})
+        form.is_valid()
+        self.assertEqual(form.cleaned_data['academic_year'], year)
+        self.assertIn('2024/2025', StudentForm().as_p())
+
+    @override_settings(CACHE_VERSION_CHECK=0)
+    def test_a_change_saved_by_another_worker_clears_this_cache(self):
+        StudentForm().as_p()
+        # Another worker's save: the row and the version bump reach the database, not this cache
+        AcademicYear.objects.bulk_create([AcademicYear(academic_year='2024/2025')])
+        utils.reserve_block('cache:reference', 1)
+        self.assertIn('2024/2025', StudentForm().as_p())
+
+
+class CountingBackend(EmailBackend):
+    """The locmem backend, counting connections and refusing mail to refused@mmust.ac.ke."""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if any('refused@mmust.ac.ke' in message.to for message in messages):
+            raise SMTPException('Recipient refused')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    MAIL_RUNNER='process', EMAIL_BACKEND='tracker.tests.CountingBackend', OUTBOX_RETRY_DELAY=60,
+    OUTBOX_MAX_ATTEMPTS=3
+)
+class OutboxTests(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+        outbox._retry_timer = None
+
+    def test_password_reset_only_queues_the_email(self):
+        System_User.objects.create(username='E0@mmust.ac.ke', password_hash='x')
+        response = self.client.post(reverse('reset-password'), {'username': 'E0@mmust.ac.ke'})
+        self.assertContains(response, 'A password reset link has been sent to E0@mmust.ac.ke.')
+        self.assertEqual(mail.outbox, [])
+
+        self.assertEqual(send_due_mail(), 1)
+        [email] = mail.outbox
+        self.assertEqual(email.to, ['E0@mmust.ac.ke'])
+        self.assertIn('/tracker/reset-password/', email.body)
+        self.assertEqual(OutboxMessage.objects.get().status, 'sent')
+
+    def test_messages_are_sent_in_batches_over_one_connection(self):
+        for n in range(5):
+            queue_mail('Subject', 'Body', [f'student{n}@mmust.ac.ke'])
+        with self.assertNumQueries(3 * 3 + 5 + 1):
+            # Find, claim and load each of three batches, then find none left; one update per message sent
+            self.assertEqual(send_due_mail(batch_size=2), 5)
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_failed_messages_back_off_then_give_up(self):
+        message = queue_mail('Subject', 'Body', ['refused@mmust.ac.ke'])
+        queue_mail('Subject', 'Body', ['student@mmust.ac.ke'])
+
+        self.assertEqual(send_due_mail(), 1)
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts, message.error), ('queued', 1, 'Recipient refused'))
+        self.assertAlmostEqual(message.next_attempt_at, timezone.now() + timedelta(seconds=60), delta=timedelta(seconds=5))
+        # Not due yet
+        self.assertEqual(send_due_mail(), 0)
+        self.assertEqual(OutboxMessage.objects.get(pk=message.pk).attempts, 1)
+
+        OutboxMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+        send_due_mail()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('queued', 2))
+        self.assertAlmostEqual(message.next_attempt_at, timezone.now() + timedelta(seconds=120), delta=timedelta(seconds=5))
+
+        OutboxMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+        with self.assertLogs('tracker.outbox', 'WARNING'):
+            send_due_mail()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 3))
+
+    @patch('tracker.outbox.threading.Timer')
+    def test_thread_runner_wakes_for_the_earliest_retry(self, timer):
+        queue_mail('Subject', 'Body', ['refused@mmust.ac.ke'])
+        send_due_mail()
+        queue_mail('Subject', 'Body', ['refused@mmust.ac.ke'])
+        OutboxMessage.objects.filter(attempts=0).update(next_attempt_at=timezone.now() + timedelta(seconds=600))
+        timer.return_value.is_alive.return_value = False
+
+        outbox._wake_for_retries()
+        [(delay, callback), kwargs] = timer.call_args
+        self.assertAlmostEqual(delay, 60, delta=5)
+        timer.return_value.start.assert_called_once()
+
+        # A timer already due earlier is kept
+        timer.return_value.is_alive.return_value = True
+        outbox._wake_for_retries()
+        self.assertEqual(timer.call_count, 1)
+
+    @override_settings(MAIL_RUNNER='sync')
+    def test_sync_runner_sends_before_returning(self):
+        queue_mail('Subject', 'Body', ['student@mmust.ac.ke'])
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(SYSTEM_USER_PASSWORD_HASHER='pbkdf2_sha256', SYSTEM_USER_HASHER_PARAMS={'iterations': 1000})
+class PasswordPolicyTests(TrackerTestData, TestCase):
+    def setUp(self):
+        self.user = System_User(username=self.exam_officer.username)
+        self.user.set_password('correct-password')
+        self.user.save()
+
+    def log_in(self, password):
+        return self.client.post(reverse('login'), {'username': self.user.username, 'password': password})
+
+    def test_passwords_are_hashed_with_the_configured_work_factor(self):
+        self.assertTrue(self.user.password_hash.startswith('pbkdf2_sha256$1000$'))
+        self.assertRedirects(self.log_in('correct-password'), reverse('exam-dashboard'), fetch_redirect_response=False)
+
+    def test_login_rehashes_a_password_stored_under_another_policy(self):
+        with self.settings(SYSTEM_USER_HASHER_PARAMS={'iterations': 2000}):
+            self.assertEqual(self.log_in('wrong-password').status_code, 200)
+            self.assertTrue(System_User.objects.get().password_hash.startswith('pbkdf2_sha256$1000$'))
+
+            self.log_in('correct-password')
+            self.assertTrue(System_User.objects.get().password_hash.startswith('pbkdf2_sha256$2000$'))
+
+        with self.settings(SYSTEM_USER_PASSWORD_HASHER='pbkdf2_sha1', SYSTEM_USER_HASHER_PARAMS={}):
+            self.log_in('correct-password')
+            user = System_User.objects.get()
+            self.assertTrue(user.password_hash.startswith('pbkdf2_sha1$'))
+            self.assertTrue(user.check_password('correct-password'))
+
+    def test_unknown_work_factor_is_rejected(self):
+        with self.settings(SYSTEM_USER_HASHER_PARAMS={'rounds': 12}):
+            with self.assertRaises(ValueError):
+                self.user.set_password('another-password')
@@ -0,0 +1,345 @@
+import zipfile
+from datetime import date, timedelta
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Student, Unit, AcademicYear, NominalRoll, Result, Upload, UploadRow
+from .search import reindex
+from .validators import REG_NO_PATTERN
+
+NOMINAL_ROLL_COLUMNS = ['reg_no', 'unit_code', 'academic_year']
+RESULT_COLUMNS = NOMINAL_ROLL_COLUMNS + ['cat', 'exam']
+RESULT_MARK_RANGES = {'cat': (0, 30), 'exam': (0, 70)}
+
+# Every column is read as text; marks are converted during validation so that
+# one bad cell rejects its row instead of the whole file.
+NOMINAL_ROLL_DTYPES = {name: str for name in NOMINAL_ROLL_COLUMNS}
+RESULT_DTYPES = {name: str for name in RESULT_COLUMNS}
+
+UPLOAD_MODELS = {'nominal_roll': NominalRoll, 'result': Result}
+
+
+def read_upload(file, dtypes, chunk_size=None):
+    """
+    Yield an uploaded CSV or Excel sheet as DataFrames of at most chunk_size rows.
+
+    CSV files are read with pandas in chunks and xlsx files with a read-only openpyxl
+    row iterator, so memory use depends on chunk_size rather than on the file size.
+    The index of each batch is the 0-based data row position in the file.
+    Raises ValueError if the file cannot be parsed.
+    """
+    chunk_size = chunk_size or getattr(settings, 'UPLOAD_CHUNK_SIZE', 5000)
+    name = file.name.lower()
+    try:
+        if name.endswith('.csv'):
+            yield from pd.read_csv(file, dtype=dtypes, chunksize=chunk_size)
+        elif name.endswith('.xlsx'):
+            yield from _read_xlsx(file, dtypes, chunk_size)
+        else:
+            # Legacy formats such as .xls have no streaming reader
+            data = pd.read_excel(file, dtype=dtypes)
+            for start in range(0, len(data), chunk_size):
+                yield data.iloc[start:start + chunk_size]
+    except (ValueError, ImportError, InvalidFileException, zipfile.BadZipFile) as e:
+        raise ValueError(f'Invalid file format: {e}') from e
+
+
+def _read_xlsx(file, dtypes, chunk_size):
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+        batch, positions = [], []
+        for position, values in enumerate(rows):
+            if all(value is None for value in values):
+                continue
+            batch.append(values[:len(header)])
+            positions.append(position)
+            if len(batch) == chunk_size:
+                yield _xlsx_frame(batch, positions, header, dtypes)
+                batch, positions = [], []
+        if batch:
+            yield _xlsx_frame(batch, positions, header, dtypes)
+    finally:
+        workbook.close()
+
+
+def _xlsx_frame(batch, positions, header, dtypes):
+    frame = pd.DataFrame(batch, columns=header, index=positions)
+    for name in dtypes:
+        if name in frame.columns:
+            column = frame[name]
+            frame[name] = column.where(column.isna(), column.astype(str))
+    return frame
+
+
+def process_upload(file, columns, dtypes, validate, upload, chunk_size=None, on_batch=None):
+    """
+    Stream an uploaded file through validate(batch, seen=...) one batch at a time
+    and stage the accepted rows of each batch as UploadRows of upload.
+
+    seen is shared between batches so duplicates are caught across the whole file.
+    on_batch, if given, is called with the running (processed, rejected) counts after
+    each batch. Returns the rejected rows and raises ValueError if the file cannot be
+    read or lacks one of the required columns.
+    """
+    batch_size = getattr(settings, 'UPLOAD_BATCH_SIZE', 1000)
+    rejected = []
+    seen = set()
+    processed = 0
+    for batch in read_upload(file, dtypes, chunk_size):
+        missing = missing_columns(batch, columns)
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}.")
+        accepted, batch_rejected = validate(batch, seen=seen)
+        UploadRow.objects.bulk_create(
+            [UploadRow(upload=upload, **row) for row in accepted], batch_size=batch_size
+        )
+        rejected.extend(batch_rejected)
+        processed += len(batch)
+        if on_batch:
+            on_batch(processed, len(rejected))
+    return rejected
+
+
+def _column(data, name):
+    """Read an uploaded column once as stripped strings, with blanks as ''."""
+    return data[name].astype('string').str.strip().fillna('')
+
+
+def missing_columns(data, columns):
+    return [name for name in columns if name not in data.columns]
+
+
+def resolve_keys(reg_nos, unit_codes, years, students=None):
+    """
+    Resolve upload keys with one IN (...) query per column.
+
+    Returns (known reg_nos, known unit_codes, {academic_year: year_id}).
+    """
+    if students is None:
+        students = Student.objects.all()
+    known_students = set(students.filter(reg_no__in=set(reg_nos)).values_list('reg_no', flat=True))
+    known_units = set(
+        Unit.objects.filter(unit_code__in=set(unit_codes)).values_list('unit_code', flat=True)
+    )
+    known_years = dict(
+        AcademicYear.objects.filter(academic_year__in=set(years)).values_list('academic_year', 'year_id')
+    )
+    return known_students, known_units, known_years
+
+
+def _reject(reasons, mask, reason):
+    """Record reason for the rows in mask that have not been rejected already."""
+    return reasons.mask(reasons.isna() & mask, reason)
+
+
+def _validate(data, model, school, seen, marks=None):
+    """
+    Run every check once per column over a batch and return the rejection reason
+    per row (None for accepted rows).
+
+    Schema checks run first, then the keys of the remaining rows are resolved
+    with resolve_keys and checked against existing rows of model in one query.
+    """
+    reg_nos, unit_codes, years = (_column(data, name) for name in NOMINAL_ROLL_COLUMNS)
+    reasons = pd.Series(None, index=data.index, dtype=object)
+
+    for name, column in zip(NOMINAL_ROLL_COLUMNS, (reg_nos, unit_codes, years)):
+        reasons = _reject(reasons, column == '', f'{name} is empty.')
+    reasons = _reject(reasons, ~reg_nos.str.match(REG_NO_PATTERN), 'Invalid registration number format.')
+    for name, values in (marks or {}).items():
+        low, high = RESULT_MARK_RANGES[name]
+        reasons = _reject(reasons, _column(data, name) == '', f'{name} is empty.')
+        reasons = _reject(reasons, values.isna(), f'{name} is not a number.')
+        reasons = _reject(reasons, values % 1 != 0, f'{name} must be a whole number.')
+        reasons = _reject(reasons, ~values.between(low, high), f'{name} should be between {low} and {high}.')
+
+    candidates = reasons.isna()
+    known_students, known_units, known_years = resolve_keys(
+        reg_nos[candidates], unit_codes[candidates], years[candidates],
+        students=Student.objects.filter(program__department__school=school),
+    )
+    reasons = _reject(reasons, ~reg_nos.isin(known_students), 'Student not found in your school.')
+    reasons = _reject(reasons, ~unit_codes.isin(known_units), 'Unit not found.')
+    reasons = _reject(reasons, ~years.isin(known_years), 'Academic year not found.')
+
+    # Rows already saved for any of the resolved keys; anything outside this set is new
+    existing = list(
+        model.objects.filter(
+            reg_no__in=known_students,
+            unit_code__in=known_units,
+            academic_year__in=known_years.values(),
+        ).values_list('reg_no', 'unit_code', 'academic_year__academic_year')
+    )
+    keys = pd.MultiIndex.from_arrays([reg_nos, unit_codes, years])
+    label = 'nominal roll' if model is NominalRoll else 'results'
+    reasons = _reject(reasons, pd.Series(keys.isin(existing), index=data.index), f'Already in the {label}.')
+
+    # In-file duplicates, within this batch and against earlier batches
+    candidates = reasons.isna().to_numpy()
+    duplicates = keys[candidates].duplicated() | keys[candidates].isin(list(seen))
+    reasons[reasons.index[candidates][duplicates]] = 'Duplicate row in file.'
+    seen.update(keys[reasons.isna().to_numpy()])
+
+    return reg_nos, unit_codes, years, years.map(known_years), reasons
+
+
+def _rejected_rows(reasons, reg_nos, unit_codes, years):
+    rejected = reasons.dropna()
+    # Spreadsheet row numbers: the header is row 1
+    return [
+        {
+            'row': int(index) + 2,
+            'reg_no': reg_nos[index],
+            'unit_code': unit_codes[index],
+            'academic_year': years[index],
+            'reason': reason,
+        }
+        for index, reason in rejected.items()
+    ]
+
+
+def _accepted_rows(reasons, reg_nos, unit_codes, year_ids):
+    accepted = reasons.isna()
+    return [
+        {'row': int(index) + 2, 'reg_no_id': reg_no, 'unit_code_id': unit_code, 'academic_year_id': int(year_id)}
+        for index, reg_no, unit_code, year_id in zip(
+            reasons.index[accepted], reg_nos[accepted], unit_codes[accepted], year_ids[accepted]
+        )
+    ]
+
+
+def validate_nominal_roll(data, school, seen=None):
+    """
+    Validate an uploaded nominal roll against the database in a fixed number of queries.
+
+    Every reg_no, unit_code and academic_year in the sheet is resolved with one
+    IN (...) query per column and existing rows are found with a single lookup,
+    so the query count does not grow with the number of rows.
+
+    Returns (accepted, rejected) where accepted holds UploadRow field values for the
+    rows that can be saved and rejected holds
+    {'row', 'reg_no', 'unit_code', 'academic_year', 'reason'}.
+    """
+    if seen is None:
+        seen = set()
+    reg_nos, unit_codes, years, year_ids, reasons = _validate(data, NominalRoll, school, seen)
+    accepted = _accepted_rows(reasons, reg_nos, unit_codes, year_ids)
+    return accepted, _rejected_rows(reasons, reg_nos, unit_codes, years)
+
+
+def validate_results(data, school, seen=None):
+    """
+    Validate an uploaded results sheet column by column.
+
+    Checks for empty cells, the registration number format, whole-number marks within
+    RESULT_MARK_RANGES, unknown keys, rows already saved and duplicate keys in the file.
+    Returns (accepted, rejected) like validate_nominal_roll.
+    """
+    if seen is None:
+        seen = set()
+    marks = {name: pd.to_numeric(data[name], errors='coerce') for name in RESULT_MARK_RANGES}
+    reg_nos, unit_codes, years, year_ids, reasons = _validate(data, Result, school, seen, marks=marks)
+
+    accepted = _accepted_rows(reasons, reg_nos, unit_codes, year_ids)
+    valid = reasons.isna()
+    for row, cat, exam in zip(accepted, marks['cat'][valid], marks['exam'][valid]):
+        row['cat'], row['exam'] = int(cat), int(exam)
+    return accepted, _rejected_rows(reasons, reg_nos, unit_codes, years)
+
+
+# Columns, dtypes and validator for each Upload.kind
+UPLOAD_FORMATS = {
+    'nominal_roll': (NOMINAL_ROLL_COLUMNS, NOMINAL_ROLL_DTYPES, validate_nominal_roll),
+    'result': (RESULT_COLUMNS, RESULT_DTYPES, validate_results),
+}
+
+
+def rejection_report(rejected):
+    """
+    Group rejected rows by reason with their row numbers collapsed into ranges.
+
+    Returns [{'reason', 'count', 'rows'}] where rows reads like '2-40, 57, 90-91'.
+    """
+    rows_by_reason = {}
+    for row in rejected:
+        rows_by_reason.setdefault(row['reason'], []).append(row['row'])
+
+    report = []
+    for reason, rows in rows_by_reason.items():
+        ranges = []
+        for row in sorted(rows):
+            if ranges and row == ranges[-1][1] + 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        report.append({
+            'reason': reason,
+            'count': len(rows),
+            'rows': ', '.join(str(low) if low == high else f'{low}-{high}' for low, high in ranges),
+        })
+    return report
+
+
+def start_upload(kind, previous_id=None):
+    """
+    Create a new Upload, discarding the user's previous unsubmitted one and any
+    upload abandoned for more than a day.
+    """
+    stale = Upload.objects.filter(created_at__lt=timezone.now() - timedelta(days=1))
+    if previous_id:
+        stale = stale | Upload.objects.filter(upload_id=previous_id)
+    stale.delete()
+    return Upload.objects.create(kind=kind)
+
+
+def promote_upload(upload):
+    """
+    Copy the staged rows of upload into NominalRoll or Result with a single
+    INSERT ... SELECT, skipping keys that already exist, then drop the upload.
+
+    Returns (inserted, skipped).
+    """
+    model = UPLOAD_MODELS[upload.kind]
+    qn = connection.ops.quote_name
+    columns = ['unit_code_id', 'reg_no_id', 'academic_year_id']
+    if model is Result:
+        columns += ['cat', 'exam']
+    insert_columns = [qn(name) for name in columns]
+    select_columns = [f'staged.{qn(name)}' for name in columns]
+    params = []
+    if model is NominalRoll:
+        # auto_now_add is not applied to raw inserts
+        insert_columns.append(qn('date'))
+        select_columns.append('%s')
+        params.append(date.today())
+    params.append(upload.upload_id)
+
+    target = qn(model._meta.db_table)
+    sql = (
+        f"INSERT INTO {target} ({', '.join(insert_columns)}) "
+        f"SELECT {', '.join(select_columns)} FROM {qn(UploadRow._meta.db_table)} staged "
+        f"WHERE staged.{qn('upload_id')} = %s AND NOT EXISTS ("
+        f"SELECT 1 FROM {target} existing "
+        f"WHERE existing.{qn('unit_code_id')} = staged.{qn('unit_code_id')} "
+        f"AND existing.{qn('reg_no_id')} = staged.{qn('reg_no_id')} "
+        f"AND existing.{qn('academic_year_id')} = staged.{qn('academic_year_id')})"
+    )
+    with transaction.atomic():
+        total = upload.rows.count()
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            inserted = cursor.rowcount
+        # Raw inserts send no signals, so index the new rows here
+        reindex(model, 't.id > %s', [last_pk], created=True)
+        upload.delete()
+    return inserted, total - inserted
@@ -6,7 +6,7 @@ from .views import (
     NominalRollListView, ResultListView, COD_ResultListView, COD_NominalRollListView, Exam_NominalRollListView,
     Exam_ResultListView, CodComplaintsView, AssignLecturerView, CodRespondView, LecturerComplaintsListView, 
     LecturerRespondView, CODResponseListView, CODApproveResponseView, ExamRespondView, ExamComplaintsListView , 
-    ExamOfficerApprovedResponsesView, DeleteResponseView, ResetPasswordView, ResetPasswordConfirmView  
+    ExamOfficerApprovedResponsesView, DeleteResponseView, ResetPasswordView, ResetPasswordConfirmView, UploadJobStatusView
 )
 
 urlpatterns = [
@@ -28,6 +28,7 @@ urlpatterns = [
     path('submit-nominal-roll/', SubmitNominalRollView.as_view(), name='submit-nominal-roll'),
     path('load-result/', LoadResultView.as_view(), name='load-result'),
     path('submit-result/', SubmitResultView.as_view(), name='submit-result'),
+    path('upload-jobs/<int:job_id>/', UploadJobStatusView.as_view(), name='upload-job-status'),
 
     path('cod/nominal-roll/', COD_NominalRollListView.as_view(), name='cod-nominal-roll'),
     path('cod/result/', COD_ResultListView.as_view(), name='cod-result'),
@@ -1,11 +1,107 @@
-import random
+import hashlib
 import string
+import threading
 
-from .models import Complaint
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
 
-def generate_unique_complaint_code(max_attempts=10):
-    for _ in range(max_attempts):
-        code = ''.join(random.choices(string.ascii_uppercase, k=3)) + ''.join(random.choices(string.digits, k=3))
-        if not Complaint.objects.filter(complaint_code=code).exists():
-            return code
-    raise Exception("Unable to generate unique complaint code after multiple attempts.")
+from .models import Complaint, CodeCounter
+
+# Complaint codes are three letters and three digits: 26**3 * 10**3 codes
+CODE_SPACE = 26 ** 3 * 1000
+# The permutation runs over a FEISTEL_HALF x FEISTEL_HALF square just larger than CODE_SPACE
+FEISTEL_HALF = 4193
+FEISTEL_ROUNDS = 4
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def _round(key, number, value):
+    digest = hashlib.blake2b(f'{key}:{number}:{value}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % FEISTEL_HALF
+
+
+def _feistel(value, key, inverse=False):
+    left, right = divmod(value, FEISTEL_HALF)
+    if inverse:
+        for number in reversed(range(FEISTEL_ROUNDS)):
+            left, right = (right - _round(key, number, left)) % FEISTEL_HALF, left
+    else:
+        for number in range(FEISTEL_ROUNDS):
+            left, right = right, (left + _round(key, number, right)) % FEISTEL_HALF
+    return left * FEISTEL_HALF + right
+
+
+def permute(index, inverse=False):
+    """
+    Shuffle 0..CODE_SPACE-1 with a keyed Feistel network, so consecutive counter values give
+    unrelated codes. Values the square maps outside the code space are walked through it again
+    until they land inside, which keeps the mapping one to one.
+    """
+    key = getattr(settings, 'COMPLAINT_CODE_KEY', 'tracker-complaint-codes')
+    value = _feistel(index, key, inverse)
+    while value >= CODE_SPACE:
+        value = _feistel(value, key, inverse)
+    return value
+
+
+def encode_code(index):
+    """Spell a position in the code space as a complaint code, e.g. 0 -> 'AAA000'."""
+    letters, digits = divmod(index, 1000)
+    spelled = ''
+    for _ in range(3):
+        letters, letter = divmod(letters, 26)
+        spelled = string.ascii_uppercase[letter] + spelled
+    return f'{spelled}{digits:03d}'
+
+
+def decode_code(code):
+    letters = 0
+    for letter in code[:3]:
+        letters = letters * 26 + string.ascii_uppercase.index(letter)
+    return letters * 1000 + int(code[3:])
+
+
+def reserve_block(name, size):
+    """Take the next size values of the named counter; concurrent callers get disjoint ranges."""
+    counter = CodeCounter.objects.filter(name=name)
+    with transaction.atomic():
+        # The UPDATE takes the row's write lock, so the value read back is this caller's own
+        if not counter.update(next_value=F('next_value') + size):
+            CodeCounter.objects.get_or_create(name=name)
+            counter.update(next_value=F('next_value') + size)
+        end = counter.values_list('next_value', flat=True).get()
+    return end - size, end
+
+
+def next_complaint_code():
+    """
+    Return a complaint code no other caller has been or will be given, without querying the
+    complaints. Counter values are reserved COMPLAINT_CODE_BLOCK_SIZE at a time per process and
+    mapped through permute(), so the codes follow no visible sequence.
+    """
+    with _blocks_lock:
+        start, end = _blocks.get('complaint', (0, 0))
+        if start == end:
+            start, end = reserve_block('complaint', getattr(settings, 'COMPLAINT_CODE_BLOCK_SIZE', 20))
+        if start >= CODE_SPACE:
+            raise RuntimeError("Every complaint code has been used.")
+        _blocks['complaint'] = (start + 1, end)
+    return encode_code(permute(start))
+
+
+def create_complaint(**fields):
+    """
+    Create a complaint under the next complaint code. Codes from the allocator never repeat, but
+    may still meet one of the random codes issued before it; such a code is skipped.
+    """
+    while True:
+        code = next_complaint_code()
+        try:
+            with transaction.atomic():
+                return Complaint.objects.create(complaint_code=code, **fields)
+        except IntegrityError:
+            if not Complaint.objects.filter(complaint_code=code).exists():
+                raise
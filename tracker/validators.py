@@ -1,6 +1,9 @@
 import re
 from django.core.exceptions import ValidationError
 
+REG_NO_PATTERN = r'^[A-Za-z]{3}/[A-Za-z]/\d{2}-\d{5}/\d{4}$'
+
+
 def validate_reg_no(value):
     # Pattern explanation:
     # - Three letters (uppercase or lowercase) at the start
@@ -10,7 +13,7 @@ def validate_reg_no(value):
     # - Two digits, followed by a hyphen ('-')
     # - Five digits, followed by a forward slash ('/')
     # - Four digits at the end (for the year)
-    if not re.match(r'^[A-Za-z]{3}/[A-Za-z]/\d{2}-\d{5}/\d{4}$', str(value)):
+    if not re.match(REG_NO_PATTERN, str(value)):
         raise ValidationError(f'{value} is not a valid registration number. Expected format: ABC/D/01-00123/2023')
 
 
@@ -0,0 +1,36 @@
+"""
+Version stamps for cached data. Cache keys carry the version of the data they hold and
+forget_cached() bumps it, which orphans every entry at once.
+
+The cache is per process, so the versions live in the database as CodeCounter rows where every
+worker sees a bump. Each process re-reads a version at most every settings.CACHE_VERSION_CHECK
+seconds: the process that made a change drops its entries at once, the others within that time.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import CodeCounter
+from .utils import reserve_block
+
+
+def _counter_name(name):
+    return f'cache:{name}'
+
+
+def _version_key(name):
+    return f'tracker:{name}:version'
+
+
+def versioned_key(name, *parts):
+    """The cache key of one entry of the named data under its current version."""
+    version = cache.get(_version_key(name))
+    if version is None:
+        version = CodeCounter.objects.filter(name=_counter_name(name)).values_list('next_value', flat=True).first() or 0
+        cache.set(_version_key(name), version, getattr(settings, 'CACHE_VERSION_CHECK', 5))
+    return ':'.join(['tracker', name, str(version), *map(str, parts)])
+
+
+def forget_cached(name):
+    """Drop every cached entry of the named data, in every process."""
+    reserve_block(_counter_name(name), 1)
+    cache.delete(_version_key(name))
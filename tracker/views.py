@@ -4,7 +4,6 @@ from django.urls import reverse_lazy, reverse
 from django.contrib.auth import logout  # Import the logout function
 from django.views.generic import DeleteView, ListView, FormView, DetailView
 from django.conf import settings
-from django.core.mail import send_mail
 from django.utils.crypto import get_random_string
 from django.utils import timezone
 from datetime import timedelta
@@ -12,18 +11,30 @@ from datetime import timedelta
 from django.db import transaction
 from django.http import JsonResponse
 from django.db import IntegrityError
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.contrib.auth.mixins import LoginRequiredMixin
 
 from django.http import Http404
+from django.core.paginator import Paginator
 
 import re
+from itertools import groupby
+from operator import attrgetter
 from django.core.exceptions import ValidationError
 import pandas as pd
 import random
 import string
 
 from django.contrib import messages
-from .utils import generate_unique_complaint_code
+from .intake import student_offerings, submit_complaint
+from .outbox import queue_mail
+from .reference import reference_rows
+from .middleware import get_lecturer_or_404
+from .stats import dashboard_stats
+from .pagination import KeysetPaginationMixin
+from .search import search_filter
+from .exports import EXPORT_FORMATS, export_response
 
 from .models import (
 Student, UnitOffering, Complaint, Course, YearOfStudy, AcademicYear, Semester, Lecturer,
@@ -45,19 +56,15 @@ class StudentSelectView(View):
         form = StudentForm(request.POST)
         if form.is_valid():
             reg_no = form.cleaned_data['reg_no']
-            course_code = form.cleaned_data['course']
+            course = form.cleaned_data['course']
             year_of_study = form.cleaned_data['year_of_study']
             academic_year = form.cleaned_data['academic_year']
             semester = form.cleaned_data['semester']
 
-            try:
-                student = Student.objects.get(reg_no=reg_no, course__course_code=course_code)
-            except Student.DoesNotExist:
+            if not Student.objects.filter(reg_no=reg_no, course_id=course.pk).exists():
                 form.add_error('reg_no', 'Student not found.')
                 return render(request, 'student_reg_no.html', {'form': form})
 
-            course = Course.objects.get(course_code=course_code)
-
             request.session['student_data'] = {
                 'reg_no': reg_no,
                 'course': course.course_code,
@@ -72,28 +79,12 @@ class StudentSelectView(View):
 
 
 class MissingMarkSelectView(View):
-    def get_student_unit_queryset(self, student_data):
-        course = Course.objects.get(course_code=student_data['course'])
-        year_of_study = YearOfStudy.objects.get(study_year=student_data['year_of_study'])
-        academic_year = AcademicYear.objects.get(academic_year=student_data['academic_year'])
-        semester = Semester.objects.get(semester_id=student_data['semester_id'])
-
-        return UnitOffering.objects.filter(
-            course=course,
-            year_of_study=year_of_study,
-            academic_year=academic_year,
-            semester=semester
-        )
-
     def get(self, request):
         student_data = request.session.get('student_data')
         if not student_data:
             return redirect('student')
 
-        units = self.get_student_unit_queryset(student_data)
-
-        form = MissingMarkForm()
-        form.fields['unit'].queryset = units
+        form = MissingMarkForm(offerings=student_offerings(student_data))
 
         return render(request, 'post_complaint.html', {'form': form})
 
@@ -102,34 +93,19 @@ class MissingMarkSelectView(View):
         if not student_data:
             return redirect('student')
 
-        units = self.get_student_unit_queryset(student_data)
-
-        form = MissingMarkForm(request.POST)
-        form.fields['unit'].queryset = units
+        form = MissingMarkForm(request.POST, offerings=student_offerings(student_data))
 
         if form.is_valid():
-            unit = form.cleaned_data['unit']
             missing_types = form.cleaned_data['missing_mark_type']
-            student = Student.objects.get(reg_no=student_data['reg_no'])
-
-            # Check if complaint already exists
-            if Complaint.objects.filter(student=student, unit_offering=unit).exists():
-                messages.warning(request, 'You have already submitted a complaint for this unit.')
-                return render(request, 'post_complaint.html', {'form': form})
 
             # Determine missing type
             missing_type = 'BOTH' if 'CAT' in missing_types and 'EXAM' in missing_types else missing_types[0]
 
-            # Generate complaint code
-            complaint_code = generate_unique_complaint_code()
-
-            # Save the complaint
-            Complaint.objects.create(
-                complaint_code=complaint_code,
-                student=student,
-                unit_offering=unit,
-                missing_type=missing_type
-            )
+            # The unique constraint on (student, unit_offering) turns a second complaint away
+            complaint = submit_complaint(student_data['reg_no'], form.cleaned_data['unit'], missing_type)
+            if complaint is None:
+                messages.warning(request, 'You have already submitted a complaint for this unit.')
+                return render(request, 'post_complaint.html', {'form': form})
 
             messages.success(request, 'Your complaint has been successfully submitted.')
             return redirect('student')
@@ -188,7 +164,7 @@ class LoginView(View):
                         request.session['username'] = user.username
                         request.session['role'] = lecturer.role
                         request.session['employee_no'] = lecturer.employee_no
-                        request.session['department_code'] = str(lecturer.department.department_code)
+                        request.session['department_code'] = str(lecturer.department_id)
 
                         if lecturer.role == "Member":
                             return redirect('lecturer-dashboard')
@@ -222,26 +198,21 @@ class ResetPasswordView(View):
             username = form.cleaned_data['username']  # This is the email address
             user = System_User.objects.filter(username=username).first()
             if user:
-                try:
-                    # Generate a unique token
-                    token = get_random_string(length=32)
-                    # Save the token to the database
-                    PasswordResetToken.objects.create(username=user, token=token)
-                    # Generate the reset link
-                    reset_link = request.build_absolute_uri(f'/reset-password/{token}/')
-                    # Send password reset email
-                    send_mail(
-                        'Reset Your Password',
-                        f'Click the link to reset your password: {reset_link}',
-                        settings.EMAIL_HOST_USER,
-                        [user.username],  # Use the username as the email address
-                        fail_silently=False,
-                    )
-                    success_message = f"A password reset link has been sent to {user.username}."
-                    return render(request, self.template_name, {'form': form, 'success_message': success_message})
-                except Exception as e:
-                    error_message = f"An error occurred: {str(e)} or Email Address does not exist in our records"
-                    return render(request, self.template_name, {'form': form, 'error_message': error_message})
+                # Generate a unique token
+                token = get_random_string(length=32)
+                # Save the token to the database
+                PasswordResetToken.objects.create(username=user, token=token)
+                # Generate the reset link
+                reset_link = request.build_absolute_uri(reverse('reset-password', kwargs={'token': token}))
+                # Queue the password reset email; the outbox sender delivers and retries it
+                queue_mail(
+                    'Reset Your Password',
+                    f'Click the link to reset your password: {reset_link}',
+                    [user.username],  # Use the username as the email address
+                    from_email=settings.EMAIL_HOST_USER,
+                )
+                success_message = f"A password reset link has been sent to {user.username}."
+                return render(request, self.template_name, {'form': form, 'success_message': success_message})
             else:
                 error_message = "Email Address does not exist in our records."
                 return render(request, self.template_name, {'form': form, 'error_message': error_message})
@@ -285,164 +256,51 @@ class ResetPasswordConfirmView(View):
         # If form is not valid, show errors
         return render(request, self.template_name, {'form': form, 'token': token, 'error_message': "Invalid form submission."})
 
-class COD_DashboardView(View):
-    def get(self, request):
-        username = request.session.get('username')
-        if not username:
-            return redirect('login')
-
-        lecturer = Lecturer.objects.filter(username=username).first()
-        if not lecturer:
-            return redirect('login')
-
-        user = System_User.objects.get(username=username)
-        department = lecturer.department
-        department_name = department.department_name
-
-        # Set session variables if not set
-        request.session.setdefault('department_code', str(department.department_code))
-        request.session.setdefault('employee_no', lecturer.employee_no)
-
-        # Total students in the department
-        total_students = Student.objects.filter(course__program__department=department).count()
-
-        # Total lecturers in the department
-        total_lecturers_in_department = Lecturer.objects.filter(department=department).count()
-
-        # Fetch UnitOfferings assigned to the current lecturer
-        lecturer_unit_offerings = UnitOffering.objects.filter(lecturer=lecturer)
-
-        # Unique units taught by the lecturer
-        unit_ids = lecturer_unit_offerings.values_list('unit', flat=True).distinct()
-        total_units_for_lecturer = unit_ids.count()
+class DashboardView(View):
+    template_name = None
+    # Which complaint counter is shown as related_complaints_count
+    complaints_count = 'assigned_complaints_count'
 
-        # Complaints related to those unit offerings        
-        related_complaints_count = Complaint.objects.filter(
-            unit_offering__unit__department=department
-        ).count()
-        related_responses_count = Response.objects.filter(unit_offering__unit__department=lecturer.department, approved_by_cod=False).count()
-
-
-        # List of courses in this department
-        courses = Course.objects.filter(program__department=department)
-
-        context = {
-            'total_students': total_students,
-            'total_lecturers_in_department': total_lecturers_in_department,
-            'total_units_for_lecturer': total_units_for_lecturer,
-            'related_complaints_count': related_complaints_count,
-            'related_responses_count': related_responses_count,
-            'last_name': lecturer.last_name,
-            'user': user,
-            'units': Unit.objects.filter(pk__in=unit_ids),
-            'courses': courses,
-            'department_name': department_name,
-        }
-
-        return render(request, 'cod_dashboard.html', context)
-
-class Exam_DashboardView(View):
     def get(self, request):
-        username = request.session.get('username')
-        if not username:
-            return redirect('login')
-
-        lecturer = Lecturer.objects.filter(username=username).first()
+        lecturer = request.lecturer
         if not lecturer:
             return redirect('login')
 
-        user = System_User.objects.get(username=username)
         department = lecturer.department
-        department_name = department.department_name
 
         # Set session variables if not set
         request.session.setdefault('department_code', str(department.department_code))
         request.session.setdefault('employee_no', lecturer.employee_no)
 
-        # Total students in the department
-        total_students = Student.objects.filter(course__program__department=department).count()
-
-        # Total lecturers in the department
-        total_lecturers_in_department = Lecturer.objects.filter(department=department).count()
-
-        # Fetch UnitOfferings assigned to the current lecturer
-        lecturer_unit_offerings = UnitOffering.objects.filter(lecturer=lecturer)
-
-        # Unique units taught by the lecturer
-        unit_ids = lecturer_unit_offerings.values_list('unit', flat=True).distinct()
-        total_units_for_lecturer = unit_ids.count()
-
-        # Complaints related to those unit offerings
-        related_complaints_count = Complaint.objects.filter(assigned_lecturer=lecturer).count()
-
-        # List of courses in this department
-        courses = Course.objects.filter(program__department=department)
+        stats = dashboard_stats(lecturer)
 
         context = {
-            'total_students': total_students,
-            'total_lecturers_in_department': total_lecturers_in_department,
-            'total_units_for_lecturer': total_units_for_lecturer,
-            'related_complaints_count': related_complaints_count,
+            'total_students': stats['total_students'],
+            'total_lecturers_in_department': stats['total_lecturers_in_department'],
+            'total_units_for_lecturer': stats['total_units_for_lecturer'],
+            'related_complaints_count': stats[self.complaints_count],
+            'related_responses_count': stats['pending_responses_count'],
             'last_name': lecturer.last_name,
-            'user': user,
-            'units': Unit.objects.filter(pk__in=unit_ids),
-            'courses': courses,
-            'department_name': department_name,
+            # Units taught by the lecturer and courses in the department
+            'units': Unit.objects.filter(unitoffering__lecturer=lecturer).distinct(),
+            'courses': [
+                course for course in reference_rows(Course).values()
+                if course.program.department_id == department.pk
+            ],
+            'department_name': department.department_name,
         }
 
-        return render(request, 'exam_dashboard.html', context)
-    
-class Lecturer_DashboardView(View):
-    def get(self, request):
-        username = request.session.get('username')
-        if not username:
-            return redirect('login')
-
-        lecturer = Lecturer.objects.filter(username=username).first()
-        if not lecturer:
-            return redirect('login')
-
-        user = System_User.objects.get(username=username)
-        department = lecturer.department
-        department_name = department.department_name
-
-        # Set session variables if not set
-        request.session.setdefault('department_code', str(department.department_code))
-        request.session.setdefault('employee_no', lecturer.employee_no)
-
-        # Total students in the department
-        total_students = Student.objects.filter(course__program__department=department).count()
+        return render(request, self.template_name, context)
 
-        # Total lecturers in the department
-        total_lecturers_in_department = Lecturer.objects.filter(department=department).count()
+class COD_DashboardView(DashboardView):
+    template_name = 'cod_dashboard.html'
+    complaints_count = 'department_complaints_count'
 
-        # Fetch UnitOfferings assigned to the current lecturer
-        lecturer_unit_offerings = UnitOffering.objects.filter(lecturer=lecturer)
+class Exam_DashboardView(DashboardView):
+    template_name = 'exam_dashboard.html'
 
-        # Unique units taught by the lecturer
-        unit_ids = lecturer_unit_offerings.values_list('unit', flat=True).distinct()
-        total_units_for_lecturer = unit_ids.count()
-
-        
-        # Complaints related to those unit offerings
-        related_complaints_count = Complaint.objects.filter(assigned_lecturer=lecturer).count()
-
-        # List of courses in this department
-        courses = Course.objects.filter(program__department=department)
-
-        context = {
-            'total_students': total_students,
-            'total_lecturers_in_department': total_lecturers_in_department,
-            'total_units_for_lecturer': total_units_for_lecturer,
-            'related_complaints_count': related_complaints_count,
-            'last_name': lecturer.last_name,
-            'user': user,
-            'units': Unit.objects.filter(pk__in=unit_ids),
-            'courses': courses,
-            'department_name': department_name,
-        }
-
-        return render(request, 'lecturer_dashboard.html', context)
+class Lecturer_DashboardView(DashboardView):
+    template_name = 'lecturer_dashboard.html'
 
 class CodComplaintsView(View):
     def get(self, request):
@@ -450,16 +308,18 @@ class CodComplaintsView(View):
         if not username:
             return redirect('login')
 
-        try:
-            cod = Lecturer.objects.get(username=username, role='COD')
-            department = cod.department
-            complaints = Complaint.objects.filter(
-                unit_offering__unit__department=department,
-                assigned_lecturer__isnull=True
-            ).select_related('student', 'unit_offering__unit')
-        except Lecturer.DoesNotExist:
+        cod = request.lecturer
+        if not cod or cod.role != 'COD':
             return redirect('login')
 
+        complaints = Complaint.objects.filter(
+            unit_offering__unit__department=cod.department,
+            assigned_lecturer__isnull=True
+        ).select_related('student', 'unit_offering__unit')
+        search = request.GET.get('search')
+        if search:
+            complaints = search_filter(complaints, search)
+
         context = {
             'complaints': complaints
         }
@@ -473,7 +333,7 @@ class AssignLecturerView(View):
             return redirect('login')
 
         complaint = get_object_or_404(Complaint, complaint_code=complaint_code)
-        cod = get_object_or_404(Lecturer, username=username, role='COD')
+        cod = get_lecturer_or_404(request, role='COD')
 
         # Query unit, student, and academic year details
         unit_offering = complaint.unit_offering
@@ -498,7 +358,7 @@ class AssignLecturerView(View):
             return redirect('login')
 
         complaint = get_object_or_404(Complaint, complaint_code=complaint_code)
-        cod = get_object_or_404(Lecturer, username=username, role='COD')
+        cod = get_lecturer_or_404(request, role='COD')
         form = AssignLecturerForm(request.POST, department=cod.department)
 
         if form.is_valid():
@@ -566,21 +426,45 @@ class CodRespondView(FormView):
         messages.error(self.request, "There was an error submitting the response.")
         return self.render_to_response(self.get_context_data(form=form))
 
-class ExamComplaintsListView(ListView):
+class ComplaintInboxView(KeysetPaginationMixin, ListView):
+    """
+    The unresolved complaints assigned to the logged-in lecturer, oldest first.
+    ?format=json returns the page as JSON with the cursors of its neighbours.
+    """
     model = Complaint
-    template_name = 'exam_complaints.html'
     context_object_name = 'complaints'
+    paginate_by = 20
+    json_fields = ['complaint_code', 'missing_type', 'submitted_at']
+    json_aliases = {
+        'reg_no': F('student'), 'unit_code': F('unit_offering__unit'), 'unit_name': F('unit_offering__unit__unit_name'),
+    }
 
-    def get_queryset(self):
-        """Return only unresolved complaints assigned to the logged-in lecturer."""
-        username = self.request.session.get('username')
-        if not username:
+    def get(self, request, *args, **kwargs):
+        if not request.session.get('username'):
             return redirect('login')
-        
-        lecturer = Lecturer.objects.filter(username=username).first()
-        if lecturer:
-            return Complaint.objects.filter(assigned_lecturer=lecturer, resolved=False)
-        return Complaint.objects.none()
+        if request.GET.get('format') == 'json':
+            return self.render_json()
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        if self.request.lecturer is None:
+            return Complaint.objects.none()
+        return Complaint.objects.inbox(self.request.lecturer)
+
+    def render_json(self):
+        paginator, page, rows, is_paginated = self.paginate_queryset(
+            self.get_queryset().values('pk', *self.json_fields, **self.json_aliases), self.paginate_by
+        )
+        names = [*self.json_fields, *self.json_aliases]
+        return JsonResponse({
+            'complaints': [{name: row[name] for name in names} for row in rows],
+            'next': page.next_token,
+            'previous': page.previous_token,
+        })
+
+
+class ExamComplaintsListView(ComplaintInboxView):
+    template_name = 'exam_complaints.html'
 
 class ExamRespondView(FormView):
     template_name = 'exam_respond.html'
@@ -632,21 +516,8 @@ class ExamRespondView(FormView):
         return self.render_to_response(self.get_context_data(form=form))
 
                                        
-class LecturerComplaintsListView(ListView):
-    model = Complaint
+class LecturerComplaintsListView(ComplaintInboxView):
     template_name = 'lecturer_complaints.html'
-    context_object_name = 'complaints'
-
-    def get_queryset(self):
-        """Return only unresolved complaints assigned to the logged-in lecturer."""
-        username = self.request.session.get('username')
-        if not username:
-            return redirect('login')
-        
-        lecturer = Lecturer.objects.filter(username=username).first()
-        if lecturer:
-            return Complaint.objects.filter(assigned_lecturer=lecturer, resolved=False)
-        return Complaint.objects.none()
 
 class LecturerRespondView(FormView):
     template_name = 'lecturer_respond.html'
@@ -699,6 +570,7 @@ class LecturerRespondView(FormView):
 
 class CODResponseListView(View):
     template_name = 'cod_responses_list.html'
+    paginate_by = 20
 
     def get(self, request):
         # Ensure the user is logged in and is a COD
@@ -706,11 +578,14 @@ class CODResponseListView(View):
         if not username:
             return redirect('login')
 
-        lecturer = Lecturer.objects.filter(username=username).first()
+        lecturer = request.lecturer
         if lecturer and lecturer.role == 'COD':
             # Get responses that are not approved by the COD
-            responses = Response.objects.filter(unit_offering__unit__department=lecturer.department, approved_by_cod=False)
-            return render(request, self.template_name, {'responses': responses})
+            responses = Response.objects.filter(
+                unit_offering__unit__department=lecturer.department, approved_by_cod=False
+            ).listing().order_by('response_date', 'response_id')
+            page_obj = Paginator(responses, self.paginate_by).get_page(request.GET.get('page'))
+            return render(request, self.template_name, {'responses': page_obj.object_list, 'page_obj': page_obj})
         
         messages.error(request, "You do not have permission to access this page.")
         return redirect('login')
@@ -726,7 +601,7 @@ class CODApproveResponseView(View):
         if not username:
             return redirect('login')
 
-        lecturer = Lecturer.objects.filter(username=username).first()
+        lecturer = request.lecturer
         if lecturer and lecturer.role == 'COD':
             # Get the response related to the complaint code
             response = Response.objects.filter(response_id=response_id).first()
@@ -745,7 +620,7 @@ class CODApproveResponseView(View):
         if not username:
             return redirect('login')
 
-        lecturer = Lecturer.objects.filter(username=username).first()
+        lecturer = request.lecturer
         if lecturer and lecturer.role == 'COD':
             # Get the response related to the response id
             response = Response.objects.filter(response_id=response_id).first()
@@ -766,46 +641,78 @@ class CODApproveResponseView(View):
         messages.error(request, "You do not have permission to access this page.")
         return redirect('login')
 
-class ExamOfficerApprovedResponsesView(ListView):
-    model = Response
+class ExamOfficerApprovedResponsesView(View):
+    """
+    Approved responses of every department in the exam officer's school, newest first and
+    paginated per department with ?page_<department code>=.
+    """
     template_name = 'approved_responses.html'
-    context_object_name = 'responses_by_department'
+    paginate_by = 20
 
-    def get_queryset(self):
-        # Check if the username is in the session
-        username = self.request.session.get('username')
-        
+    def get(self, request):
+        username = request.session.get('username')
         if not username:
-            # If username is not in session, redirect to login
             return redirect('login')
-        
-        try:
-            # Retrieve the lecturer using the username from session
-            lecturer = Lecturer.objects.filter(username=username).first()
-        except Lecturer.DoesNotExist:
+
+        lecturer = request.lecturer
+        if lecturer is None:
             raise Http404("Lecturer not found")
-        
-        # Check if the user is an Exam Officer
         if lecturer.role != 'Exam Officer':
             raise Http404("You are not authorized to access this page.")
-        
-        # Retrieve the department and the school the Exam Officer belongs to
-        department = lecturer.department
-        school = department.school
 
-        # Retrieve all departments in the same school
-        departments_in_school = Department.objects.filter(school=school)
+        departments = list(Department.objects.filter(school=lecturer.department.school_id).order_by('pk'))
+        pages = {department.pk: self.requested_page(department) for department in departments}
+        rows = self.approved_responses(lecturer.department.school_id, pages)
+
+        grouped = {department: list(responses) for department, responses in groupby(rows, key=attrgetter('department'))}
+        department_groups = []
+        for department in departments:
+            responses = grouped.get(department.pk, [])
+            total = responses[0].department_total if responses else 0
+            number = pages[department.pk]
+            department_groups.append({
+                'department': department,
+                'responses': responses,
+                'number': number,
+                'num_pages': max(1, -(-total // self.paginate_by)),
+                'previous_query': self.page_query(department, number - 1) if number > 1 else None,
+                'next_query': self.page_query(department, number + 1) if number * self.paginate_by < total else None,
+            })
+        return render(request, self.template_name, {'department_groups': department_groups})
+
+    def approved_responses(self, school, pages):
+        """
+        One query for the requested page of every department: rows are numbered within their
+        department by a window function and only each department's page is kept.
+        """
+        department = F('unit_offering__unit__department')
+        responses = Response.objects.filter(
+            unit_offering__unit__department__school=school, approved_by_cod=True
+        ).listing().annotate(
+            department=department,
+            position=Window(RowNumber(), partition_by=[department], order_by=[F('response_date').desc(), F('pk').desc()]),
+            department_total=Window(Count('pk'), partition_by=[department]),
+        )
+        on_page = Q()
+        for code, number in pages.items():
+            on_page |= Q(
+                department=code,
+                position__gt=(number - 1) * self.paginate_by,
+                position__lte=number * self.paginate_by,
+            )
+        return responses.filter(on_page).order_by('department', 'position')
 
-        # Prepare a dictionary to store the responses grouped by department
-        responses_by_department = {}
+    def requested_page(self, department):
+        try:
+            return max(1, int(self.request.GET.get(f'page_{department.pk}', 1)))
+        except ValueError:
+            return 1
 
-        for department in departments_in_school:
-            responses_by_department[department] = Response.objects.filter(
-                unit_offering__unit__department=department,
-                approved_by_cod=True
-            )
+    def page_query(self, department, number):
+        params = self.request.GET.copy()
+        params[f'page_{department.pk}'] = number
+        return params.urlencode()
 
-        return responses_by_department
 
 class DeleteResponseView(DeleteView):
     model = Response
@@ -825,427 +732,253 @@ from django.views import View
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from .forms import UploadFileForm
-from .models import Lecturer, Student, Unit, AcademicYear, NominalRoll, Result
-import pandas as pd
+from .models import Lecturer, Student, Unit, AcademicYear, NominalRoll, Result, Upload, UploadJob
+from .uploads import start_upload
+from .jobs import enqueue, fail_abandoned_jobs, is_abandoned
 
 
-class LoadNominalRollView(View):
+class UploadPreviewView(View):
+    """Upload a sheet for background validation, then page through the staged rows."""
+    kind = None
+    template_name = None
+    paginate_by = 50
+
     def get(self, request):
-        form = UploadFileForm()
-        return render(request, 'load_nominal_roll.html', {'form': form})
+        context = {'form': UploadFileForm()}
+
+        job = UploadJob.objects.filter(job_id=request.session.get(f'{self.kind}_job')).first()
+        if job and job.status in ('queued', 'running'):
+            context['job'] = job
+        elif job:
+            del request.session[f'{self.kind}_job']
+            if job.status == 'failed':
+                messages.error(request, job.error)
+                if job.action == 'validate':
+                    # tracker.jobs discarded the partly staged upload
+                    request.session.pop(f'{self.kind}_upload', None)
+            elif job.action == 'commit':
+                messages.success(request, f'Data saved successfully: {job.committed} saved, {job.rejected} already existed.')
+
+        upload = Upload.objects.filter(upload_id=request.session.get(f'{self.kind}_upload'), kind=self.kind).first()
+        if upload and 'job' not in context:
+            rows = upload.rows.select_related('academic_year').order_by('row')
+            page_obj = Paginator(rows, self.paginate_by).get_page(request.GET.get('page'))
+            context.update({
+                'page_obj': page_obj,
+                'preview_data': page_obj.object_list,
+                'rejection_report': upload.rejection_report,
+            })
+        return render(request, self.template_name, context)
 
     def post(self, request):
         form = UploadFileForm(request.POST, request.FILES)
         if not form.is_valid():
-            return render(request, 'load_nominal_roll.html', {'form': form})
-
-        file = request.FILES['file']
-        try:
-            data = pd.read_csv(file) if file.name.endswith('.csv') else pd.read_excel(file)
-        except Exception:
-            messages.error(request, 'Invalid file format.')
-            return render(request, 'load_nominal_roll.html', {'form': form})
+            return render(request, self.template_name, {'form': form})
 
         username = request.session.get('username')
         if not username:
             return redirect('login')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        students = Student.objects.filter(program__department__school=lecturer.department.school)
-
-        preview_data = []
-        for row in data.itertuples():
-            try:
-                reg_no = row.reg_no
-                unit_code = row.unit_code
-                year = row.academic_year
-
-                student = students.get(reg_no=reg_no)
-                unit = Unit.objects.get(unit_code=unit_code)
-                academic_year = AcademicYear.objects.get(academic_year=year)
-
-                if not NominalRoll.objects.filter(reg_no=student, unit_code=unit, academic_year=academic_year).exists():
-                    preview_data.append({'reg_no': reg_no, 'unit_code': unit_code, 'academic_year': year})
-            except:
-                continue
-
-        request.session['nominal_preview'] = preview_data
-        return render(request, 'load_nominal_roll.html', {'form': form, 'preview_data': preview_data})
-
-
-class SubmitNominalRollView(View):
-    def post(self, request):
-        preview_data = request.session.pop('nominal_preview', [])
-        for row in preview_data:
-            student = get_object_or_404(Student, reg_no=row['reg_no'])
-            unit = get_object_or_404(Unit, unit_code=row['unit_code'])
-            year = get_object_or_404(AcademicYear, academic_year=row['academic_year'])
+        lecturer = get_lecturer_or_404(request)
 
-            NominalRoll.objects.create(reg_no=student, unit_code=unit, academic_year=year)
+        upload = start_upload(self.kind, request.session.pop(f'{self.kind}_upload', None))
+        file = request.FILES['file']
+        job = UploadJob(action='validate', upload=upload, lecturer=lecturer)
+        job.file.save(file.name, file)
+        enqueue(job)
 
-        messages.success(request, 'Nominal Roll data saved successfully.')
-        return redirect('load-nominal-roll')
+        request.session[f'{self.kind}_upload'] = upload.upload_id
+        request.session[f'{self.kind}_job'] = job.job_id
+        return redirect(request.path)
 
 
-class LoadResultView(View):
-    def get(self, request):
-        form = UploadFileForm()
-        return render(request, 'load_result.html', {'form': form})
+class UploadSubmitView(View):
+    """Queue the staged rows of the user's upload to be saved."""
+    kind = None
+    redirect_to = None
 
     def post(self, request):
-        form = UploadFileForm(request.POST, request.FILES)
-        if not form.is_valid():
-            return render(request, 'load_result.html', {'form': form})
-
-        file = request.FILES['file']
-        try:
-            data = pd.read_csv(file) if file.name.endswith('.csv') else pd.read_excel(file)
-        except Exception:
-            messages.error(request, 'Invalid file format.')
-            return render(request, 'load_result.html', {'form': form})
-
         username = request.session.get('username')
         if not username:
             return redirect('login')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        students = Student.objects.filter(program__department__school=lecturer.department.school)
-
-        preview_data = []
-        for row in data.itertuples():
-            try:
-                student = students.get(reg_no=row.reg_no)
-                unit = Unit.objects.get(unit_code=row.unit_code)
-                academic_year = AcademicYear.objects.get(academic_year=row.academic_year)
-                if 0 <= row.cat <= 30 and 0 <= row.exam <= 70:
-                    if not Result.objects.filter(reg_no=student, unit_code=unit, academic_year=academic_year).exists():
-                        preview_data.append({
-                            'reg_no': row.reg_no,
-                            'unit_code': row.unit_code,
-                            'academic_year': row.academic_year,
-                            'cat': row.cat,
-                            'exam': row.exam
-                        })
-            except:
-                continue
-
-        request.session['result_preview'] = preview_data
-        return render(request, 'load_result.html', {'form': form, 'preview_data': preview_data})
-
-
-class SubmitResultView(View):
-    def post(self, request):
-        preview_data = request.session.pop('result_preview', [])
-        for row in preview_data:
-            student = get_object_or_404(Student, reg_no=row['reg_no'])
-            unit = get_object_or_404(Unit, unit_code=row['unit_code'])
-            year = get_object_or_404(AcademicYear, academic_year=row['academic_year'])
-
-            Result.objects.create(
-                reg_no=student,
-                unit_code=unit,
-                academic_year=year,
-                cat=row['cat'],
-                exam=row['exam']
-            )
-
-        messages.success(request, 'Result data saved successfully.')
-        return redirect('load-result')
-
-class ResultListView(ListView):
-    model = Result
-    template_name = 'result_list.html'
-    context_object_name = 'results'
-    paginate_by = 20
-
-    def get_queryset(self):
-        username = self.request.session.get('username')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        employee_no = lecturer.employee_no
-
-        offerings = UnitOffering.objects.filter(lecturer__employee_no=employee_no).select_related('unit', 'academic_year')
-        allowed_units = {
-            (offering.unit.unit_code, offering.academic_year.academic_year)
-            for offering in offerings
-        }
-
-        queryset = Result.objects.filter(
-            unit_code__unit_code__in=[u for u, _ in allowed_units],
-            academic_year__academic_year__in=[y for _, y in allowed_units]
-        )
+        lecturer = get_lecturer_or_404(request)
+
+        # Only an upload whose validation ran to the end may be saved
+        upload = Upload.objects.filter(
+            upload_id=request.session.get(f'{self.kind}_upload'), kind=self.kind,
+            jobs__action='validate', jobs__status='done',
+        ).first()
+        if not upload:
+            messages.error(request, 'There is no validated upload to submit.')
+            return redirect(self.redirect_to)
+        del request.session[f'{self.kind}_upload']
+
+        job = UploadJob.objects.create(action='commit', upload=upload, lecturer=lecturer)
+        enqueue(job)
+        request.session[f'{self.kind}_job'] = job.job_id
+        return redirect(self.redirect_to)
+
+
+class UploadJobStatusView(View):
+    def get(self, request, job_id):
+        job = get_object_or_404(UploadJob, job_id=job_id, lecturer__username=request.session.get('username'))
+        if is_abandoned(job) and fail_abandoned_jobs(job_id=job.job_id):
+            job.refresh_from_db()
+        return JsonResponse({
+            'status': job.status,
+            'processed': job.processed,
+            'rejected': job.rejected,
+            'committed': job.committed,
+            'error': job.error,
+        })
 
-        academic_year = self.request.GET.get('academic_year')
-        unit_code = self.request.GET.get('unit_code')
-        reg_no = self.request.GET.get('reg_no')
-        search = self.request.GET.get('search')
 
-        if academic_year:
-            queryset = queryset.filter(academic_year__academic_year=academic_year)
-        if unit_code:
-            queryset = queryset.filter(unit_code__unit_code__icontains=unit_code)
-        if reg_no:
-            queryset = queryset.filter(reg_no__icontains=reg_no)
-        if search:
-            queryset = queryset.filter(
-                academic_year__academic_year__icontains=search
-            ) | queryset.filter(
-                unit_code__unit_code__icontains=search
-            ) | queryset.filter(
-                reg_no__icontains=search
-            )
+class LoadNominalRollView(UploadPreviewView):
+    kind = 'nominal_roll'
+    template_name = 'load_nominal_roll.html'
 
-        sort_field = self.request.GET.get('sort', 'reg_no')
-        return queryset.order_by(sort_field)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['academic_years'] = AcademicYear.objects.all()
-        return context
+class SubmitNominalRollView(UploadSubmitView):
+    kind = 'nominal_roll'
+    redirect_to = 'load-nominal-roll'
 
-class NominalRollListView(ListView):
-    model = NominalRoll
-    template_name = 'nominal_roll_list.html'
-    context_object_name = 'nominal_rolls'
-    paginate_by = 20
 
-    def get_queryset(self):
-        username = self.request.session.get('username')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        employee_no = lecturer.employee_no
-
-        offerings = UnitOffering.objects.filter(lecturer__employee_no=employee_no).select_related('unit', 'academic_year')
-        allowed_units = {
-            (offering.unit.unit_code, offering.academic_year.academic_year)
-            for offering in offerings
-        }
+class LoadResultView(UploadPreviewView):
+    kind = 'result'
+    template_name = 'load_result.html'
 
-        queryset = NominalRoll.objects.filter(
-            unit_code__unit_code__in=[u for u, _ in allowed_units],
-            academic_year__academic_year__in=[y for _, y in allowed_units]
-        )
 
-        academic_year = self.request.GET.get('academic_year')
-        unit_code = self.request.GET.get('unit_code')
-        reg_no = self.request.GET.get('reg_no')
-        search = self.request.GET.get('search')
+class SubmitResultView(UploadSubmitView):
+    kind = 'result'
+    redirect_to = 'load-result'
 
-        if academic_year:
-            queryset = queryset.filter(academic_year__academic_year__icontains=academic_year)
-        if unit_code:
-            queryset = queryset.filter(unit_code__unit_code__icontains=unit_code)
-        if reg_no:
-            queryset = queryset.filter(reg_no__icontains=reg_no)
-        if search:
-            queryset = queryset.filter(
-                academic_year__academic_year__icontains=search
-            ) | queryset.filter(
-                unit_code__unit_code__icontains=search
-            ) | queryset.filter(
-                reg_no__icontains=search
-            )
+def taught_by(model, lecturer):
+    """
+    Rows of Result or NominalRoll whose exact (unit, academic year) pair is one of the lecturer's
+    unit offerings, selected in a single statement.
+    """
+    taught = model.objects.filter(
+        unit_code__unitoffering__lecturer=lecturer,
+        unit_code__unitoffering__academic_year=F('academic_year'),
+    )
+    # pk__in rather than distinct() so a unit offered to several courses is listed once
+    return model.objects.filter(pk__in=taught.values('pk'))
 
-        sort_field = self.request.GET.get('sort', 'reg_no')
-        return queryset.order_by(sort_field)
+class FilteredListView(KeysetPaginationMixin, ListView):
+    """
+    A lecturer's result or nominal roll list, filtered, searched and sorted from the query string.
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['academic_years'] = AcademicYear.objects.all()
-        return context
+    Rows are values() dicts of 'pk', the columns, the annotations and the sort column.
 
-class Exam_ResultListView(ListView):
-    model = Result
-    template_name = 'exam_result_list.html'
-    context_object_name = 'results'
+    - columns: the fields the template shows. Foreign keys render as their key and related
+      columns ('academic_year__academic_year') by their full path.
+    - annotations: values computed in SQL.
+    - filters: query string parameter -> lookup.
+    - sort_fields: the fields ?sort= may name, optionally prefixed with '-'.
+    - export_columns: (key, heading) pairs streamed by ?export=csv or ?export=xlsx, which
+      exports every row matching the current filters.
+    """
     paginate_by = 20
+    columns = []
+    annotations = {}
+    filters = {}
+    sort_fields = []
+    default_sort = 'reg_no'
+    export_columns = []
+    export_filename = 'export'
 
-    def get_queryset(self):
-        username = self.request.session.get('username')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        employee_no = lecturer.employee_no
-
-        offerings = UnitOffering.objects.filter(lecturer__employee_no=employee_no).select_related('unit', 'academic_year')
-        allowed_units = {
-            (offering.unit.unit_code, offering.academic_year.academic_year)
-            for offering in offerings
-        }
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('export')
+        if file_format in EXPORT_FORMATS and self.export_columns:
+            queryset = self.get_queryset().values(*[key for key, heading in self.export_columns])
+            return export_response(queryset, self.export_columns, self.export_filename, file_format)
+        return super().get(request, *args, **kwargs)
 
-        queryset = Result.objects.filter(
-            unit_code__unit_code__in=[u for u, _ in allowed_units],
-            academic_year__academic_year__in=[y for _, y in allowed_units]
-        )
+    def get_queryset(self):
+        lecturer = get_lecturer_or_404(self.request)
+        queryset = taught_by(self.model, lecturer)
 
-        academic_year = self.request.GET.get('academic_year')
-        unit_code = self.request.GET.get('unit_code')
-        reg_no = self.request.GET.get('reg_no')
+        for param, lookup in self.filters.items():
+            value = self.request.GET.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
         search = self.request.GET.get('search')
-
-        if academic_year:
-            queryset = queryset.filter(academic_year__academic_year=academic_year)
-        if unit_code:
-            queryset = queryset.filter(unit_code__unit_code__icontains=unit_code)
-        if reg_no:
-            queryset = queryset.filter(reg_no__icontains=reg_no)
         if search:
-            queryset = queryset.filter(
-                academic_year__academic_year__icontains=search
-            ) | queryset.filter(
-                unit_code__unit_code__icontains=search
-            ) | queryset.filter(
-                reg_no__icontains=search
-            )
+            queryset = search_filter(queryset, search)
 
-        sort_field = self.request.GET.get('sort', 'reg_no')
-        return queryset.order_by(sort_field)
+        sort = self.request.GET.get('sort', self.default_sort)
+        if sort.lstrip('-') not in self.sort_fields:
+            sort = self.default_sort
+
+        # The paginator's cursor reads the sort column from each row, so it has to be selected
+        # even when only a related column of it ('academic_year__academic_year') is shown
+        columns = [*self.columns, *self.annotations]
+        if sort.lstrip('-') not in columns:
+            columns.append(sort.lstrip('-'))
+        return queryset.annotate(**self.annotations).values('pk', *columns).order_by(sort)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['academic_years'] = AcademicYear.objects.all()
+        context['academic_years'] = reference_rows(AcademicYear).values()
+        if self.export_columns:
+            context['export_queries'] = {}
+            for file_format in EXPORT_FORMATS:
+                params = self.request.GET.copy()
+                params.pop(self.cursor_param, None)
+                params['export'] = file_format
+                context['export_queries'][file_format] = params.urlencode()
         return context
 
-class Exam_NominalRollListView(ListView):
-    model = NominalRoll
-    template_name = 'exam_nominal_roll_list.html'
-    context_object_name = 'nominal_rolls'
-    paginate_by = 20
 
-    def get_queryset(self):
-        username = self.request.session.get('username')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        employee_no = lecturer.employee_no
-
-        offerings = UnitOffering.objects.filter(lecturer__employee_no=employee_no).select_related('unit', 'academic_year')
-        allowed_units = {
-            (offering.unit.unit_code, offering.academic_year.academic_year)
-            for offering in offerings
-        }
-
-        queryset = NominalRoll.objects.filter(
-            unit_code__unit_code__in=[u for u, _ in allowed_units],
-            academic_year__academic_year__in=[y for _, y in allowed_units]
-        )
+# The academic year comes from a select of exact values; codes match anywhere in them, so
+# e.g. the serial number alone finds a reg no. Both codes are the foreign key columns
+# themselves, so no join is needed to filter.
+MARKS_LIST_FILTERS = {
+    'academic_year': 'academic_year__academic_year',
+    'unit_code': 'unit_code__unit_code__icontains',
+    'reg_no': 'reg_no__reg_no__icontains',
+}
 
-        academic_year = self.request.GET.get('academic_year')
-        unit_code = self.request.GET.get('unit_code')
-        reg_no = self.request.GET.get('reg_no')
-        search = self.request.GET.get('search')
-
-        if academic_year:
-            queryset = queryset.filter(academic_year__academic_year__icontains=academic_year)
-        if unit_code:
-            queryset = queryset.filter(unit_code__unit_code__icontains=unit_code)
-        if reg_no:
-            queryset = queryset.filter(reg_no__icontains=reg_no)
-        if search:
-            queryset = queryset.filter(
-                academic_year__academic_year__icontains=search
-            ) | queryset.filter(
-                unit_code__unit_code__icontains=search
-            ) | queryset.filter(
-                reg_no__icontains=search
-            )
 
-        sort_field = self.request.GET.get('sort', 'reg_no')
-        return queryset.order_by(sort_field)
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['academic_years'] = AcademicYear.objects.all()
-        return context
-
-class COD_ResultListView(ListView):
+class ResultListView(FilteredListView):
     model = Result
-    template_name = 'cod_result_list.html'
+    template_name = 'result_list.html'
     context_object_name = 'results'
-    paginate_by = 20
-
-    def get_queryset(self):
-        username = self.request.session.get('username')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        employee_no = lecturer.employee_no
-
-        offerings = UnitOffering.objects.filter(lecturer__employee_no=employee_no).select_related('unit', 'academic_year')
-        allowed_units = {
-            (offering.unit.unit_code, offering.academic_year.academic_year)
-            for offering in offerings
-        }
-
-        queryset = Result.objects.filter(
-            unit_code__unit_code__in=[u for u, _ in allowed_units],
-            academic_year__academic_year__in=[y for _, y in allowed_units]
-        )
-
-        academic_year = self.request.GET.get('academic_year')
-        unit_code = self.request.GET.get('unit_code')
-        reg_no = self.request.GET.get('reg_no')
-        search = self.request.GET.get('search')
-
-        if academic_year:
-            queryset = queryset.filter(academic_year__academic_year=academic_year)
-        if unit_code:
-            queryset = queryset.filter(unit_code__unit_code__icontains=unit_code)
-        if reg_no:
-            queryset = queryset.filter(reg_no__icontains=reg_no)
-        if search:
-            queryset = queryset.filter(
-                academic_year__academic_year__icontains=search
-            ) | queryset.filter(
-                unit_code__unit_code__icontains=search
-            ) | queryset.filter(
-                reg_no__icontains=search
-            )
-
-        sort_field = self.request.GET.get('sort', 'reg_no')
-        return queryset.order_by(sort_field)
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['academic_years'] = AcademicYear.objects.all()
-        return context
-
-class COD_NominalRollListView(ListView):
+    columns = ['reg_no', 'unit_code', 'academic_year__academic_year', 'cat', 'exam']
+    annotations = {'total': Coalesce('cat', 0) + Coalesce('exam', 0)}
+    filters = MARKS_LIST_FILTERS
+    sort_fields = ['reg_no', 'unit_code', 'academic_year', 'cat', 'exam', 'total']
+    export_columns = [
+        ('reg_no', 'Reg No'), ('unit_code', 'Unit Code'), ('academic_year__academic_year', 'Academic Year'),
+        ('cat', 'CAT'), ('exam', 'Exam'), ('total', 'Total'),
+    ]
+    export_filename = 'results'
+
+
+class NominalRollListView(FilteredListView):
     model = NominalRoll
-    template_name = 'cod_nominal_roll_list.html'
+    template_name = 'nominal_roll_list.html'
     context_object_name = 'nominal_rolls'
-    paginate_by = 20
+    columns = ['reg_no', 'unit_code', 'academic_year__academic_year', 'date']
+    filters = MARKS_LIST_FILTERS
+    sort_fields = ['reg_no', 'unit_code', 'academic_year', 'date']
+    export_columns = [
+        ('reg_no', 'Reg No'), ('unit_code', 'Unit Code'), ('academic_year__academic_year', 'Academic Year'),
+        ('date', 'Date Added'),
+    ]
+    export_filename = 'nominal_roll'
 
-    def get_queryset(self):
-        username = self.request.session.get('username')
-        lecturer = get_object_or_404(Lecturer, username=username)
-        employee_no = lecturer.employee_no
-
-        offerings = UnitOffering.objects.filter(lecturer__employee_no=employee_no).select_related('unit', 'academic_year')
-        allowed_units = {
-            (offering.unit.unit_code, offering.academic_year.academic_year)
-            for offering in offerings
-        }
 
-        queryset = NominalRoll.objects.filter(
-            unit_code__unit_code__in=[u for u, _ in allowed_units],
-            academic_year__academic_year__in=[y for _, y in allowed_units]
-        )
+class Exam_ResultListView(ResultListView):
+    template_name = 'exam_result_list.html'
 
-        academic_year = self.request.GET.get('academic_year')
-        unit_code = self.request.GET.get('unit_code')
-        reg_no = self.request.GET.get('reg_no')
-        search = self.request.GET.get('search')
 
-        if academic_year:
-            queryset = queryset.filter(academic_year__academic_year__icontains=academic_year)
-        if unit_code:
-            queryset = queryset.filter(unit_code__unit_code__icontains=unit_code)
-        if reg_no:
-            queryset = queryset.filter(reg_no__icontains=reg_no)
-        if search:
-            queryset = queryset.filter(
-                academic_year__academic_year__icontains=search
-            ) | queryset.filter(
-                unit_code__unit_code__icontains=search
-            ) | queryset.filter(
-                reg_no__icontains=search
-            )
+class Exam_NominalRollListView(NominalRollListView):
+    template_name = 'exam_nominal_roll_list.html'
 
-        sort_field = self.request.GET.get('sort', 'reg_no')
-        return queryset.order_by(sort_field)
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['academic_years'] = AcademicYear.objects.all()
-        return context
+class COD_ResultListView(ResultListView):
+    template_name = 'cod_result_list.html'
+
+
+class COD_NominalRollListView(NominalRollListView):
+    template_name = 'cod_nominal_roll_list.html'